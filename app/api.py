@@ -0,0 +1,416 @@
+"""Headless JSON API over the outreach engine, for the CRM and other non-Streamlit callers.
+
+    python app/api.py --port 8080
+
+    POST /v1/institution     {"url", "name"?}                         -> saved/analysed institution profile
+    POST /v1/company         {"company", "institution_summary"? | "institution_url"?, "institution_name"?, "fused"?}
+    POST /v1/extract-jobs    {"text" | "url", "institution_context"?}
+    POST /v1/links           {"skills"}
+    POST /v1/email           {"company_name", "user_details", "recipient" | "recipients", "intent"?, "job"?,
+                              "links"?, "institution_summary"?}
+    GET  /v1/tasks/<id>      status and result of a queued request
+    GET  /health, GET /metrics
+
+Every POST runs on a worker pool. The response waits up to `wait` seconds (per-request,
+with a per-endpoint default) and returns 200 with the result, or 202 with a task id to poll.
+Requests need `Authorization: Bearer $API_TOKEN`; without API_TOKEN the API only serves
+locally, and not at all when deployed serverless. URLs to fetch must be http(s) on public
+hosts, and so must every redirect and crawled page they lead to. Chain and Portfolio are
+created once per process. Only the standard library is imported up front, so a serverless
+cold start (the `handler` class, for Vercel) pays for langchain, chromadb and friends only
+on the first request that needs them.
+"""
+import argparse
+import hmac
+import ipaddress
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import resources
+import telemetry
+
+API_TOKEN = os.getenv("API_TOKEN")
+WORKERS = int(os.getenv("API_WORKERS", "4"))
+TASK_TTL = int(os.getenv("API_TASK_TTL", "3600"))
+# A serverless instance may be frozen or recycled between requests, so polling can't be relied on there
+SERVERLESS = bool(os.getenv("VERCEL"))
+MAX_WAIT = 55.0 if SERVERLESS else 300.0
+MAX_BODY = 2 * 1024 * 1024
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+_engine_lock = threading.Lock()
+_chain = None
+_portfolio = None
+
+
+def get_chain():
+    global _chain
+    with _engine_lock:
+        if _chain is None:
+            from chains import Chain
+
+            _chain = Chain(api_key=os.getenv("GROQ_API_KEY"))
+        return _chain
+
+
+def get_portfolio():
+    global _portfolio
+    with _engine_lock:
+        if _portfolio is None:
+            from portfolio import Portfolio
+
+            _portfolio = Portfolio()
+            _portfolio.load_portfolio()
+        return _portfolio
+
+
+class TaskRegistry:
+    """Requests running on the worker pool, kept for TASK_TTL seconds after they finish."""
+
+    def __init__(self, workers=WORKERS, ttl=TASK_TTL):
+        self.ttl = ttl
+        self._pool = None
+        self._workers = workers
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, work):
+        task = {"id": uuid.uuid4().hex, "kind": kind, "status": "queued", "created_at": time.time(),
+                "finished_at": None, "result": None, "error": None}
+
+        def run():
+            task["status"] = "running"
+            try:
+                with telemetry.trace(f"api.{kind}", task=task["id"]):
+                    task["result"] = work()
+                task["status"] = "done"
+            except Exception as e:
+                task["status"] = "failed"
+                task["error"] = {"status": getattr(e, "status", 500), "message": str(e) or type(e).__name__}
+            finally:
+                task["finished_at"] = time.time()
+            return task
+
+        with self._lock:
+            self._purge()
+            if self._pool is None:
+                # Created on first use so importing this module (a cold start) starts no threads
+                self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="api")
+            task["future"] = self._pool.submit(run)
+            self._tasks[task["id"]] = task
+        telemetry.set_gauge("api_tasks", len(self._tasks))
+        return task
+
+    def get(self, task_id):
+        with self._lock:
+            return self._tasks.get(task_id)
+
+    def _purge(self):
+        cutoff = time.time() - self.ttl
+        for task_id in [t["id"] for t in self._tasks.values() if t["finished_at"] and t["finished_at"] < cutoff]:
+            del self._tasks[task_id]
+
+
+TASKS = TaskRegistry()
+
+
+def public(task):
+    return {k: v for k, v in task.items() if k != "future"}
+
+
+def public_url(url):
+    """`url` if it is http(s) on a host that only resolves to public addresses, else a 400."""
+    parts = urlsplit(url.strip()) if isinstance(url, str) else None
+    if parts is None or parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ApiError(400, "Only http(s) URLs can be fetched.")
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or None, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, ValueError):
+        raise ApiError(400, f"Cannot resolve {parts.hostname}.")
+    # No fetching of loopback, private, link-local (cloud metadata) or reserved addresses for callers
+    if any(not ipaddress.ip_address(info[4][0].split("%")[0]).is_global for info in infos):
+        raise ApiError(400, f"{parts.hostname} is not a public host.")
+    return url
+
+
+def guard_fetches():
+    # Everything this process fetches is for an API caller: the shared fetcher vets every URL,
+    # redirect hop and crawled page with public_url, not just the URL the caller sent
+    from fetch import set_url_check
+
+    set_url_check(public_url)
+
+
+def _require(body, *fields):
+    missing = [field for field in fields if not body.get(field)]
+    if missing:
+        raise ApiError(400, f"Missing field(s): {', '.join(missing)}")
+
+
+_JSON_TYPES = {dict: "an object", list: "an array", str: "a string"}
+
+
+def _check_type(value, kind, name):
+    # Caught here as a 400, instead of failing in the worker as a 500 (e.g. .get on a string)
+    if value is not None and not isinstance(value, kind):
+        raise ApiError(400, f"{name} must be {_JSON_TYPES[kind]}.")
+    return value
+
+
+def institution_route(body):
+    _require(body, "url")
+    _check_type(body.get("name"), str, "name")
+    public_url(body["url"])
+
+    def work():
+        from pipeline import institution_profile
+
+        guard_fetches()
+        profile = institution_profile(get_chain(), body["url"], body.get("name", ""))
+        if profile is None:
+            raise ApiError(422, "The institution site could not be scraped.")
+        return {k: profile[k] for k in ("url", "institution_name", "summary", "updated_at", "cached", "refreshing")}
+    return work
+
+
+def company_route(body):
+    _require(body, "company")
+    for field in ("company", "institution_summary", "institution_name"):
+        _check_type(body.get(field), str, field)
+    if body.get("institution_url"):
+        public_url(body["institution_url"])
+
+    def work():
+        from pipeline import COMPANY_SEARCHES, company_intelligence, institution_profile, search_company, search_key
+
+        guard_fetches()
+        display_name = body["company"].strip().title()
+        fused = bool(body.get("fused", True))
+        institution_name = body.get("institution_name", "")
+        summary = body.get("institution_summary", "")
+        if not summary and body.get("institution_url"):
+            profile = institution_profile(get_chain(), body["institution_url"], institution_name)
+            summary = profile["summary"] if profile else ""
+
+        def run():
+            results_raw = search_company(display_name)
+            if not results_raw:
+                return None
+            return company_intelligence(get_chain(), display_name, results_raw, institution_name, summary,
+                                        fused=fused)
+
+        # Shares in-flight runs and the short memo with the Streamlit page (in the same mode)
+        intel, shared = COMPANY_SEARCHES.do(search_key(display_name, summary, fused), run)
+        if intel is None:
+            raise ApiError(404, f"No search results for {display_name}.")
+        return {"company": display_name, "shared": shared, **intel}
+    return work
+
+
+def extract_jobs_route(body):
+    if not body.get("text") and not body.get("url"):
+        raise ApiError(400, "Missing field(s): text or url")
+    _check_type(body.get("text"), str, "text")
+    _check_type(body.get("institution_context"), str, "institution_context")
+    if not body.get("text"):
+        public_url(body["url"])
+
+    def work():
+        text = body.get("text")
+        if text:
+            from ranking import career_excerpt
+
+            # Same token budget as crawled pages: the job-relevant chunks, not the first N characters
+            text = career_excerpt(text)
+        else:
+            from pipeline import gather_job_data
+
+            guard_fetches()
+            text = gather_job_data([], body["url"])
+            if not text:
+                raise ApiError(422, "The career site could not be scraped.")
+        return {"jobs": get_chain().extract_jobs(text, institution_context=body.get("institution_context", ""))}
+    return work
+
+
+def links_route(body):
+    _require(body, "skills")
+    return lambda: {"links": get_portfolio().query_links(body["skills"])}
+
+
+def email_route(body):
+    _require(body, "company_name", "user_details")
+    if not body.get("recipient") and not body.get("recipients"):
+        raise ApiError(400, "Missing field(s): recipient or recipients")
+    _check_type(body["user_details"], dict, "user_details")
+    _check_type(body.get("job"), dict, "job")
+    _check_type(body.get("institution_summary"), str, "institution_summary")
+    if body.get("recipient"):
+        _check_type(body["recipient"], dict, "recipient")
+    else:
+        for index, recipient in enumerate(_check_type(body["recipients"], list, "recipients")):
+            _check_type(recipient, dict, f"recipients[{index}]")
+
+    def work():
+        chain = get_chain()
+        job = body.get("job")
+        summary = body.get("institution_summary", "")
+        links = body.get("links")
+        if links is None:
+            skills = job.get("skills", []) if job else summary.split()[:5]
+            links = get_portfolio().query_links(skills) if skills else []
+        common = dict(job=job, links=links, user_details=body["user_details"],
+                      intent=body.get("intent", "Campus Hiring Drive 2024-25"),
+                      company_name=body["company_name"], institution_summary=summary)
+        if body.get("recipient"):
+            return {"draft": chain.write_mail(recipient_details=body["recipient"], **common)}
+        recipients = body["recipients"]
+        drafts = [None] * len(recipients)
+        for index, draft, error in chain.write_mails(recipients=recipients, **common):
+            drafts[index] = {"recipient": recipients[index], "draft": draft, "error": str(error) if error else None}
+        return {"drafts": drafts}
+    return work
+
+
+# path -> (builds the work from the request body, default seconds to wait before answering 202)
+ROUTES = {
+    "/v1/institution": (institution_route, 30.0),
+    "/v1/company": (company_route, 0.0),
+    "/v1/extract-jobs": (extract_jobs_route, 0.0),
+    "/v1/links": (links_route, 30.0),
+    "/v1/email": (email_route, 30.0),
+}
+
+
+class handler(BaseHTTPRequestHandler):
+    """Request handler; also the entry point Vercel's Python runtime looks for."""
+
+    server_version = "OutreachAPI/1.0"
+
+    def log_message(self, format, *args):
+        if os.getenv("API_ACCESS_LOG"):
+            super().log_message(format, *args)
+
+    def _send(self, status, payload, content_type="application/json"):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _path(self):
+        # Vercel routes arrive with their /api prefix
+        path = urlsplit(self.path).path.rstrip("/")
+        if path == "/api" or path.startswith("/api/"):
+            path = path[len("/api"):]
+        return path or "/"
+
+    def _auth_error(self):
+        """(status, message) if the request may not proceed, else None."""
+        if not API_TOKEN:
+            # A public deployment without a token would spend the Groq quota for anyone
+            return (503, "API_TOKEN is not configured.") if SERVERLESS else None
+        supplied = self.headers.get("Authorization", "").encode("utf-8")
+        if not hmac.compare_digest(supplied, f"Bearer {API_TOKEN}".encode("utf-8")):
+            return 401, "Unauthorized."
+        return None
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY:
+            raise ApiError(413, "Request body too large.")
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            raise ApiError(400, "Request body must be JSON.")
+        if not isinstance(body, dict):
+            raise ApiError(400, "Request body must be a JSON object.")
+        return body
+
+    def do_GET(self):
+        path = self._path()
+        if path == "/health":
+            return self._send(200, {"status": "ok", **resources.startup_report()})
+        denied = self._auth_error()
+        if denied:
+            return self._send(denied[0], {"error": denied[1]})
+        if path == "/metrics":
+            return self._send(200, telemetry.prometheus_text().encode("utf-8"), "text/plain; version=0.0.4")
+        if path.startswith("/v1/tasks/"):
+            task = TASKS.get(path[len("/v1/tasks/"):])
+            if task is None:
+                return self._send(404, {"error": "Unknown or expired task."})
+            return self._send(200, public(task))
+        self._send(404, {"error": "Not found."})
+
+    def do_POST(self):
+        path = self._path()
+        denied = self._auth_error()
+        if denied:
+            return self._send(denied[0], {"error": denied[1]})
+        if path not in ROUTES:
+            return self._send(404, {"error": "Not found."})
+        build, default_wait = ROUTES[path]
+        try:
+            body = self._read_json()
+            work = build(body)
+            wait = min(float(body.get("wait", MAX_WAIT if SERVERLESS else default_wait)), MAX_WAIT)
+        except ApiError as e:
+            return self._send(e.status, {"error": str(e)})
+        except (TypeError, ValueError) as e:
+            return self._send(400, {"error": str(e)})
+
+        task = TASKS.submit(path.rsplit("/", 1)[-1], work)
+        try:
+            task["future"].result(timeout=wait)
+        except FutureTimeout:
+            return self._send(202, {"task_id": task["id"], "status": task["status"], "poll": f"/v1/tasks/{task['id']}"})
+        if task["status"] == "failed":
+            return self._send(task["error"]["status"], {"task_id": task["id"], "error": task["error"]["message"]})
+        self._send(200, {"task_id": task["id"], "result": task["result"]})
+
+
+def serve(host="127.0.0.1", port=8080, warm=True):
+    if warm:
+        resources.start_warmup()
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"Outreach API on http://{host}:{server.server_port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JSON HTTP API for the outreach engine")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8080")))
+    parser.add_argument("--no-warmup", action="store_true", help="Don't import heavy dependencies ahead of the first request")
+    args = parser.parse_args(argv)
+    if not API_TOKEN and args.host not in ("127.0.0.1", "localhost", "::1"):
+        parser.error("set API_TOKEN before serving on a non-local address")
+    serve(args.host, args.port, warm=not args.no_warmup)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Headless batch mode: run the company intelligence pipeline over a list of targets.
+
+    python app/batch.py companies.csv -o results.jsonl --institution-name "ABC Institute" --institution-url https://abc.edu
+
+Each company goes through search -> crawl -> one combined report/jobs call (or, with
+--two-call, report in parallel with crawl -> extract_jobs). Companies whose career content
+is unchanged since their last scan reuse the stored jobs and only get a new report. Every
+stage has its own concurrency limit, and a JSONL record is written as soon as a company finishes.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+
+import telemetry
+from scheduler import classify
+from pipeline import (institution_profile, search_company, pick_career_url, format_snippets,
+                      gather_job_chunks, build_institution_context, stored_jobs, record_jobs, merge_jobs,
+                      EXTRACT_CHUNKS)
+
+
+class StageLimits:
+    def __init__(self, search=4, scrape=8, llm=4):
+        self.search = asyncio.Semaphore(search)
+        self.scrape = asyncio.Semaphore(scrape)
+        self.llm = asyncio.Semaphore(llm)
+
+
+def load_companies(path):
+    # Accepts a CSV with a `company` (or `Company`) column, or a plain list with one name per line
+    with open(path, newline="", encoding="utf-8") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        header = next(csv.reader(sample.splitlines()[:1]), [])
+        if any(cell.strip().lower() == "company" for cell in header):
+            reader = csv.DictReader(f)
+            column = next(c for c in reader.fieldnames if c.strip().lower() == "company")
+            names = [row[column] for row in reader]
+        else:
+            names = [line for line in f]
+    seen = set()
+    companies = []
+    for name in names:
+        name = (name or "").strip()
+        if name and name.lower() not in seen:
+            seen.add(name.lower())
+            companies.append(name)
+    return companies
+
+
+async def _process_company(chain, company, limits, institution_name="", institution_summary="", fused=True):
+    display_name = company.strip().title()
+    started = time.perf_counter()
+    record = {"company": display_name, "career_url": None, "report": None, "jobs": [], "changes": None, "error": None}
+    report_task = None
+    try:
+        async with limits.search:
+            results_raw = await asyncio.to_thread(search_company, display_name)
+        if not results_raw:
+            record["error"] = "no search results"
+            return record
+
+        inst_context = build_institution_context(institution_name, institution_summary, display_name)
+        career_url = pick_career_url(results_raw, display_name)
+        record["career_url"] = career_url
+        snippets = format_snippets(results_raw)
+
+        async def report_stage():
+            async with limits.llm:
+                return await chain.agenerate_company_report(display_name, snippets, institution_summary)
+
+        async def extract_stage(part):
+            async with limits.llm:
+                return await chain.aextract_jobs(part, institution_context=inst_context)
+
+        # Two-call mode needs the report whatever the career site says, so it overlaps the crawl
+        report_task = None if fused else asyncio.create_task(report_stage())
+        async with limits.scrape:
+            parts = await asyncio.to_thread(gather_job_chunks, results_raw, career_url, EXTRACT_CHUNKS)
+        stored = stored_jobs(display_name, parts, inst_context)
+        if stored:
+            # Unchanged career content: the stored jobs stand and only the report needs the model
+            record["jobs"], record["changes"] = stored
+            record["report"] = await (report_task or report_stage())
+            return record
+
+        if fused and len(parts) == 1:
+            try:
+                async with limits.llm:
+                    intel = await chain.acompany_intelligence(display_name, snippets, parts[0],
+                                                              institution_name, institution_summary)
+                record["report"], record["jobs"] = intel["report"], intel["jobs"]
+                record["changes"] = record_jobs(display_name, career_url, parts, inst_context, record["jobs"])
+                return record
+            except Exception as e:
+                if classify(e) == "rate_limit":
+                    raise
+                print(f"Combined intelligence failed for {display_name}, using separate calls: {e}", file=sys.stderr)
+
+        report_task = report_task or asyncio.create_task(report_stage())
+        record["jobs"] = merge_jobs(await asyncio.gather(*(extract_stage(part) for part in parts)))
+        record["report"] = await report_task
+        record["changes"] = record_jobs(display_name, career_url, parts, inst_context, record["jobs"])
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        if report_task is not None:
+            report_task.cancel()
+    finally:
+        record["elapsed_s"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+async def process_company(chain, company, limits, institution_name="", institution_summary="", fused=True):
+    # Each company gets its own trace; asyncio tasks and to_thread copy the context, so stage spans land in it
+    with telemetry.trace("company_batch", company=company.strip().title()) as trace:
+        record = await _process_company(chain, company, limits, institution_name, institution_summary, fused)
+    record["trace_id"] = trace.id
+    return record
+
+
+async def run_batch_async(companies, output_path, chain=None, api_key=None, institution_name="",
+                          institution_summary="", search_concurrency=4, scrape_concurrency=8,
+                          llm_concurrency=4, fused=True, log=print):
+    if chain is None:
+        from chains import Chain
+        chain = Chain(api_key=api_key, lane="batch")
+
+    limits = StageLimits(search=search_concurrency, scrape=scrape_concurrency, llm=llm_concurrency)
+    started = time.perf_counter()
+    done = failed = unchanged = 0
+
+    tasks = [asyncio.create_task(process_company(chain, company, limits, institution_name, institution_summary, fused))
+             for company in companies]
+    with open(output_path, "a", encoding="utf-8") as out:
+        for finished in asyncio.as_completed(tasks):
+            record = await finished
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            done += 1
+            failed += bool(record["error"])
+            reused = bool(record["changes"] and record["changes"]["unchanged"])
+            unchanged += reused
+            rate = done / max(time.perf_counter() - started, 1e-9) * 60
+            log(f"[{done}/{len(companies)}] {record['company']}: "
+                f"{'error: ' + record['error'] if record['error'] else str(len(record['jobs'])) + ' jobs'}"
+                f"{' (unchanged)' if reused else ''} "
+                f"({record['elapsed_s']}s, {rate:.1f} companies/min)")
+
+    elapsed = time.perf_counter() - started
+    return {
+        "companies": done,
+        "failed": failed,
+        "unchanged": unchanged,
+        "elapsed_s": round(elapsed, 3),
+        "companies_per_minute": round(done / elapsed * 60, 2) if elapsed else 0.0,
+    }
+
+
+def run_batch(companies, output_path, **kwargs):
+    """Blocking entry point for scripts and notebooks; see run_batch_async for the options."""
+    return asyncio.run(run_batch_async(companies, output_path, **kwargs))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run company intelligence for a list of target companies.")
+    parser.add_argument("companies", help="CSV with a `company` column, or a text file with one company per line")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("--institution-name", default="")
+    summary_group = parser.add_mutually_exclusive_group()
+    summary_group.add_argument("--institution-summary", default="", help="Institution summary text")
+    summary_group.add_argument("--institution-summary-file", help="File containing the institution summary")
+    summary_group.add_argument("--institution-url", help="Scrape and summarize the institution website once up front")
+    parser.add_argument("--search-concurrency", type=int, default=4)
+    parser.add_argument("--scrape-concurrency", type=int, default=8)
+    parser.add_argument("--llm-concurrency", type=int, default=4)
+    parser.add_argument("--two-call", action="store_true",
+                        help="Use separate report and extraction calls instead of one combined call")
+    args = parser.parse_args(argv)
+
+    from chains import Chain
+    chain = Chain(api_key=os.getenv("GROQ_API_KEY"), lane="batch")
+
+    institution_summary = args.institution_summary
+    if args.institution_summary_file:
+        with open(args.institution_summary_file, encoding="utf-8") as f:
+            institution_summary = f.read().strip()
+    elif args.institution_url:
+        # Same saved profile the UI uses, so a known institution isn't scraped and summarised again
+        profile = institution_profile(chain, args.institution_url, args.institution_name)
+        institution_summary = profile["summary"] if profile else ""
+
+    companies = load_companies(args.companies)
+    print(f"Processing {len(companies)} companies -> {args.output}", file=sys.stderr)
+    stats = run_batch(
+        companies, args.output, chain=chain,
+        institution_name=args.institution_name,
+        institution_summary=institution_summary,
+        search_concurrency=args.search_concurrency,
+        scrape_concurrency=args.scrape_concurrency,
+        llm_concurrency=args.llm_concurrency,
+        fused=not args.two_call,
+        log=lambda line: print(line, file=sys.stderr),
+    )
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
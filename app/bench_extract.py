@@ -0,0 +1,89 @@
+"""Micro-benchmark: single-pass extraction vs. the old BeautifulSoup + five-regex cleaner.
+
+Save some real pages first (e.g. `curl -L -o pages/infosys.html https://www.infosys.com/careers/`), then:
+
+    python app/bench_extract.py pages/*.html --repeat 5
+
+Every page is checked for identical output before it is timed.
+"""
+import argparse
+import re
+import statistics
+import time
+
+import extract
+from utils import clean_text
+
+
+def legacy_clean_text(text):
+    # The cleaner as it was before it was fused; kept here as the reference implementation
+    text = re.sub(r'<[^>]*?>', '', text)
+    text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', text)
+    text = re.sub(r'[^a-zA-Z0-9 ]', '', text)
+    text = re.sub(r'\s{2,}', ' ', text)
+    text = text.strip()
+    text = ' '.join(text.split())
+    return text
+
+
+def legacy_html_to_text(html):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    for element in soup(["script", "style", "nav", "footer", "header", "form"]):
+        element.decompose()
+    return legacy_clean_text(soup.get_text(separator=' '))
+
+
+def best_of(fn, arg, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(arg)
+        timings.append(time.perf_counter() - started)
+    return result, min(timings), statistics.median(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pages", nargs="+", help="Saved HTML files")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    try:
+        import bs4  # noqa: F401
+        have_bs4 = True
+    except ImportError:
+        have_bs4 = False
+        print("beautifulsoup4 not installed: comparing the text cleaners only")
+
+    print(f"extract backend: {extract.BACKEND}")
+    print(f"{'page':40} {'KB':>8} {'stage':12} {'old ms':>9} {'new ms':>9} {'speedup':>8}  match")
+    mismatches = 0
+    for path in args.pages:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            html = f.read()
+        size_kb = len(html.encode("utf-8")) / 1024
+
+        rows = [("clean_text", legacy_clean_text, clean_text, html)]
+        if have_bs4:
+            rows.append(("html->text", legacy_html_to_text, extract.html_to_text, html))
+            for name, fn in extract.BACKENDS.items():
+                if name != extract.BACKEND:
+                    rows.append((f"  {name}", legacy_html_to_text, fn, html))
+
+        for stage, old_fn, new_fn, arg in rows:
+            old_out, old_best, _ = best_of(old_fn, arg, args.repeat)
+            new_out, new_best, _ = best_of(new_fn, arg, args.repeat)
+            match = old_out == new_out
+            mismatches += not match
+            print(f"{path[-40:]:40} {size_kb:8.1f} {stage:12} {old_best * 1000:9.2f} {new_best * 1000:9.2f} "
+                  f"{old_best / max(new_best, 1e-9):7.1f}x  {'yes' if match else 'NO'}")
+
+    if mismatches:
+        print(f"{mismatches} output mismatch(es)")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
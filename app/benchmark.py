@@ -0,0 +1,407 @@
+"""Offline end-to-end benchmark with local stand-ins for Groq, DDGS and career sites.
+
+    python app/benchmark.py --iterations 20 --llm-latency 0.3 --tokens-per-s 250 -o bench/run.json
+    python app/benchmark.py --compare bench/before.json bench/after.json
+
+Nothing leaves the machine: the chat model is FakeChatGroq, search is FakeDDGS, and pages
+come from a local HTTP server (recorded pages from --pages DIR, or generated ones).
+Per-stage p50/p95 latency, throughput and peak RSS are written as JSON for comparison.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+try:
+    import resource
+except ImportError:
+    # Unix only; peak RSS is reported as unavailable elsewhere (e.g. Windows)
+    resource = None
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# On-disk caches pointed at the scratch directory for a run, and the module singletons holding them
+SCRATCH_PATHS = {"FETCH_CACHE_PATH": "fetch_cache.sqlite3", "SEARCH_CACHE_PATH": "search_cache.sqlite3",
+                 "JOB_STORE_PATH": "job_store.sqlite3"}
+SCRATCH_SINGLETONS = (("fetch", "_fetcher"), ("search", "_cache"), ("job_store", "_store"))
+
+ROLES = ["Software Engineer", "Data Analyst", "Cloud Engineer", "QA Engineer", "ML Engineer",
+         "Frontend Developer", "Backend Developer", "DevOps Engineer", "Business Analyst", "Graduate Trainee"]
+SKILLS = ["Python", "Java", "React", "AWS", "SQL", "Docker", "Kubernetes", "Spark", "Node.js", "Selenium"]
+
+
+class FakeChatGroq(BaseChatModel):
+    """Chat model with Groq-like timing: a fixed time to first token, then tokens_per_s."""
+
+    model_name: str = "fake-llama-3.3-70b"
+    temperature: float = 0
+    latency_s: float = 0.3
+    tokens_per_s: float = 250.0
+    jobs_per_page: int = 5
+
+    @property
+    def _llm_type(self):
+        return "fake-groq"
+
+    def _reply(self, prompt):
+        rng = random.Random(len(prompt))
+        jobs = [{"role": rng.choice(ROLES), "experience": f"{rng.randint(0, 8)}+ years",
+                 "skills": rng.sample(SKILLS, 3), "description": "Build and operate production systems."}
+                for _ in range(self.jobs_per_page)]
+        if "`report`" in prompt:
+            return json.dumps({"report": "Strategic focus on cloud and AI. " * 20, "jobs": jobs})
+        if "VALID JSON" in prompt:
+            return json.dumps({"jobs": jobs})
+        return "Executive summary of the opportunity with concrete next steps. " * 25
+
+    def _usage(self, prompt, text):
+        prompt_tokens, completion_tokens = len(prompt) // 4 + 1, len(text) // 4 + 1
+        return prompt_tokens, completion_tokens
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = "\n".join(str(m.content) for m in messages)
+        text = self._reply(prompt)
+        prompt_tokens, completion_tokens = self._usage(prompt, text)
+        time.sleep(self.latency_s + completion_tokens / self.tokens_per_s)
+        message = AIMessage(
+            content=text,
+            response_metadata={"model_name": self.model_name, "token_usage": {
+                "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}},
+            usage_metadata={"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                            "total_tokens": prompt_tokens + completion_tokens},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = "\n".join(str(m.content) for m in messages)
+        text = self._reply(prompt)
+        time.sleep(self.latency_s)
+        # Roughly four characters per token
+        for start in range(0, len(text), 4):
+            time.sleep(1 / self.tokens_per_s)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text[start:start + 4]))
+
+
+class FakeDDGS:
+    """Drop-in for ddgs.DDGS whose results point at the local page server."""
+
+    base_url = "http://127.0.0.1:0"
+    latency_s = 0.05
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def text(self, query, max_results=8):
+        time.sleep(self.latency_s)
+        company = re.split(r" (?:careers|campus)", query)[0].lower().replace(" ", "-")
+        results = [{"title": f"{query} - Careers", "href": f"{self.base_url}/careers/{company}",
+                    "body": f"{query}: explore open roles in engineering, data and cloud."}]
+        results += [{"title": f"{query} news {n}", "href": f"{self.base_url}/news/{company}/{n}",
+                     "body": "Company expands its technology centre and campus hiring."}
+                    for n in range(max_results - 1)]
+        return results
+
+
+class FakeEmbeddingFunction:
+    """Deterministic bag-of-words hashing embeddings, so the portfolio needs no model download."""
+
+    dimensions = 384
+
+    def __call__(self, input):
+        import numpy as np
+
+        vectors = np.zeros((len(input), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(input):
+            for word in text.lower().replace(",", " ").split():
+                vectors[row, zlib.crc32(word.encode()) % self.dimensions] += 1.0
+        return vectors.tolist()
+
+    def name(self):
+        return "fake-hashing"
+
+
+def generated_career_page(company, jobs=60):
+    rng = random.Random(company)
+    listings = "".join(
+        f'<div class="job"><h3>{rng.choice(ROLES)}</h3><p>Location: Bengaluru. Experience: {rng.randint(0, 8)} years. '
+        f'Skills: {", ".join(rng.sample(SKILLS, 4))}. Apply at https://{company}.example.com/jobs/{n}</p></div>'
+        for n in range(jobs)
+    )
+    return (f"<html><head><title>{company} careers</title><style>.job{{margin:4px}}</style>"
+            f"<script>window.__STATE__={{}};</script></head><body><header>Menu</header><nav>Home About</nav>"
+            f"<main><h1>Careers at {company}</h1>{listings}</main><footer>Copyright</footer></body></html>")
+
+
+def generated_institution_page():
+    departments = "".join(f"<section><h2>Department of {d}</h2><p>{d} students are placed with leading recruiters. "
+                          f"Labs, research centres and industry training programs. " * 5 + "</p></section>"
+                          for d in ["Computer Science", "Information Technology", "Electronics", "Mechanical"])
+    return f"<html><body><nav>Admissions</nav><h1>ABC Institute of Technology</h1>{departments}</body></html>"
+
+
+class PageServer:
+    """Local HTTP server for recorded (or generated) career and institution pages."""
+
+    def __init__(self, pages_dir=None, latency_s=0.02):
+        recorded = {}
+        if pages_dir:
+            for name in os.listdir(pages_dir):
+                if name.endswith((".html", ".htm")):
+                    with open(os.path.join(pages_dir, name), encoding="utf-8", errors="replace") as f:
+                        recorded[os.path.splitext(name)[0]] = f.read()
+        server_latency = latency_s
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(server_latency)
+                parts = self.path.strip("/").split("/")
+                if parts[0] == "institution":
+                    body = recorded.get("institution") or generated_institution_page()
+                elif recorded:
+                    # Recorded career pages are spread over companies by a stable hash of the name
+                    key = sorted(k for k in recorded if k != "institution")
+                    body = recorded[key[zlib.crc32(parts[-1].encode()) % len(key)]] if key else generated_career_page(parts[-1])
+                else:
+                    body = generated_career_page(parts[1] if len(parts) > 1 else "acme")
+                payload = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        return False
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}
+
+    def measure(self, stage, fn, *args, **kwargs):
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.samples.setdefault(stage, []).append(time.perf_counter() - started)
+        return result
+
+    def add(self, stage, seconds):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def summary(self):
+        stages = {}
+        for stage, values in self.samples.items():
+            total = sum(values)
+            stages[stage] = {
+                "n": len(values),
+                "p50_ms": round(percentile(values, 50) * 1000, 3),
+                "p95_ms": round(percentile(values, 95) * 1000, 3),
+                "mean_ms": round(total / len(values) * 1000, 3),
+                "throughput_per_s": round(len(values) / total, 3) if total else None,
+            }
+        return stages
+
+
+def run(iterations=10, llm_latency=0.3, tokens_per_s=250.0, search_latency=0.05, server_latency=0.02,
+        pages_dir=None, portfolio_backend="numpy"):
+    sys.path.insert(0, APP_DIR)
+    pages_dir = os.path.abspath(pages_dir) if pages_dir else None
+    workdir = tempfile.mkdtemp(prefix="outreach-bench-")
+    previous_cwd = os.getcwd()
+    previous_ddgs = sys.modules.get("ddgs")
+    # Point every on-disk cache at the scratch directory and keep the LLM cache out of the numbers;
+    # the caller's settings and any caches it already opened are put back afterwards
+    previous_env = {name: os.environ.get(name) for name in SCRATCH_PATHS}
+    previous_singletons = {(module, attr): getattr(sys.modules[module], attr)
+                           for module, attr in SCRATCH_SINGLETONS if module in sys.modules}
+    for name, filename in SCRATCH_PATHS.items():
+        os.environ[name] = os.path.join(workdir, filename)
+    try:
+        os.makedirs(os.path.join(workdir, "resource"))
+        shutil.copy(os.path.join(APP_DIR, "resource", "my_portfolio.csv"), os.path.join(workdir, "resource"))
+        os.chdir(workdir)
+
+        import fetch
+        import pipeline
+        import utils
+        from chains import Chain
+        from extract import html_to_text
+        from portfolio import Portfolio
+
+        fake_ddgs = types.ModuleType("ddgs")
+        fake_ddgs.DDGS = FakeDDGS
+        sys.modules["ddgs"] = fake_ddgs
+        # max_age=0 with no validators from the server: every scrape is a real fetch + parse
+        fetch._fetcher = fetch.Fetcher(cache=fetch.ResponseCache(os.path.join(workdir, "fetch_cache.sqlite3")), max_age=0,
+                                       min_interval=0)
+
+        llm = FakeChatGroq(latency_s=llm_latency, tokens_per_s=tokens_per_s)
+        # Pacing against real Groq limits would swamp the pipeline numbers
+        chain = Chain(cache=False, llm=llm, scheduler=False)
+        rec = Recorder()
+
+        with PageServer(pages_dir, latency_s=server_latency) as server:
+            FakeDDGS.base_url = server.base_url
+            FakeDDGS.latency_s = search_latency
+
+            portfolio = rec.measure("portfolio.init", Portfolio, backend=portfolio_backend,
+                                    embedding_function=FakeEmbeddingFunction())
+            rec.measure("portfolio.load_portfolio", portfolio.load_portfolio)
+
+            institution_html = fetch._fetcher.session.get(f"{server.base_url}/institution").text
+            institution_text = rec.measure("scrape_page_content", utils.scrape_page_content, f"{server.base_url}/institution")
+            summary = rec.measure("summarize_institution", chain.summarize_institution, institution_text or "")
+
+            for n in range(iterations):
+                company = f"Company {n}"
+                results = rec.measure("search", pipeline.search_company, company)
+                career_url = pipeline.pick_career_url(results, company)
+                page_html = fetch._fetcher.session.get(career_url).text
+                rec.measure("html_to_text", html_to_text, page_html)
+                rec.measure("clean_text", utils.clean_text, page_html)
+                page = rec.measure("scrape_page_content", utils.scrape_page_content, career_url) or ""
+                context = pipeline.build_institution_context("ABC Institute", summary, company)
+                snippets = pipeline.format_snippets(results)
+
+                jobs = rec.measure("extract_jobs", chain.extract_jobs, page, institution_context=context)
+                rec.measure("generate_company_report", chain.generate_company_report, company, snippets, summary)
+                rec.measure("company_intelligence", chain.company_intelligence, company, snippets, page,
+                            "ABC Institute", summary)
+                rec.measure("pipeline.end_to_end", pipeline.company_intelligence, chain, company, results,
+                            "ABC Institute", summary)
+
+                skills = (jobs[0].get("skills") if jobs else None) or SKILLS[:3]
+                links = rec.measure("portfolio.query_links", portfolio.query_links, skills)
+                mail_args = dict(job=jobs[0] if jobs else None, links=links,
+                                 user_details={"name": "Prof. Rao", "designation": "Head of Corporate Relations",
+                                               "institution_name": "ABC Institute"},
+                                 recipient_details={"name": "Jane", "designation": "HR Head"},
+                                 intent="Campus Hiring Drive", company_name=company, institution_summary=summary)
+                rec.measure("write_mail", chain.write_mail, **mail_args)
+
+                started = time.perf_counter()
+                stream = chain.stream_mail(**mail_args)
+                next(stream)
+                rec.add("stream_mail.first_chunk", time.perf_counter() - started)
+                for _ in stream:
+                    pass
+                rec.add("stream_mail.total", time.perf_counter() - started)
+
+        return {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {"iterations": iterations, "llm_latency_s": llm_latency, "tokens_per_s": tokens_per_s,
+                       "search_latency_s": search_latency, "server_latency_s": server_latency,
+                       "pages_dir": pages_dir, "portfolio_backend": portfolio_backend,
+                       "institution_page_bytes": len(institution_html)},
+            "stages": rec.summary(),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+    finally:
+        os.chdir(previous_cwd)
+        for name, value in previous_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        for module, attr in SCRATCH_SINGLETONS:
+            if module in sys.modules:
+                # None makes the module open a fresh one from the restored settings on next use
+                setattr(sys.modules[module], attr, previous_singletons.get((module, attr)))
+        if previous_ddgs is not None:
+            sys.modules["ddgs"] = previous_ddgs
+        else:
+            sys.modules.pop("ddgs", None)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(before_path, after_path):
+    with open(before_path, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(after_path, encoding="utf-8") as f:
+        after = json.load(f)
+    print(f"{'stage':28} {'p50 before':>11} {'p50 after':>10} {'change':>8}")
+    for stage in sorted(set(before["stages"]) | set(after["stages"])):
+        old = before["stages"].get(stage, {}).get("p50_ms")
+        new = after["stages"].get(stage, {}).get("p50_ms")
+        change = f"{(new - old) / old * 100:+.1f}%" if old and new is not None else "n/a"
+        print(f"{stage:28} {old if old is not None else '-':>11} {new if new is not None else '-':>10} {change:>8}")
+    old, new = before.get('peak_rss_mb'), after.get('peak_rss_mb')
+    print(f"{'peak_rss_mb':28} {old if old is not None else '-':>11} {new if new is not None else '-':>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmark")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Seconds to first token")
+    parser.add_argument("--tokens-per-s", type=float, default=250.0)
+    parser.add_argument("--search-latency", type=float, default=0.05)
+    parser.add_argument("--server-latency", type=float, default=0.02)
+    parser.add_argument("--pages", help="Directory of recorded .html pages (institution.html is the institution)")
+    parser.add_argument("--portfolio-backend", default="numpy", choices=["numpy", "chroma"])
+    parser.add_argument("-o", "--output", help="Write the JSON report here")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two saved reports")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run(iterations=args.iterations, llm_latency=args.llm_latency, tokens_per_s=args.tokens_per_s,
+                 search_latency=args.search_latency, server_latency=args.server_latency,
+                 pages_dir=args.pages, portfolio_backend=args.portfolio_backend)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,26 @@
+import hashlib
+import json
 import os
+import re
+import sqlite3
+import threading
+import time
 from langchain_groq import ChatGroq
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.exceptions import OutputParserException
+from langchain_core.runnables import RunnableLambda
 from dotenv import load_dotenv
 
+import resources
+import telemetry
+from json_stream import JsonArrayStream
+from scheduler import get_scheduler, estimate_tokens, classify
+
 # Load environment variables
 load_dotenv()
 
-class Chain:
-    def __init__(self, api_key=None):
-        # Use provided key or fallback to env
-        final_key = api_key or os.getenv("GROQ_API_KEY")
-        self.llm = ChatGroq(
-            temperature=0, 
-            groq_api_key=final_key, 
-            model_name="llama-3.3-70b-versatile"
-        )
-
-    def summarize_institution(self, cleaned_text):
-        prompt_summary = PromptTemplate.from_template(
-            """
+SUMMARY_TEMPLATE = """
             ### SCRAPED TEXT FROM INSTITUTION WEBSITE:
             {page_data}
             
@@ -31,17 +31,8 @@ class Chain:
             
             ### SUMMARY (NO PREAMBLE):
             """
-        )
-        chain_summary = prompt_summary | self.llm
-        try:
-            res = chain_summary.invoke(input={"page_data": cleaned_text})
-            return res.content
-        except Exception as e:
-            return "Institution summary unavailable due to analysis error."
 
-    def extract_jobs(self, cleaned_text, institution_context=""):
-        prompt_extract = PromptTemplate.from_template(
-            """
+EXTRACT_TEMPLATE = """
             ### SCRAPED TEXT FROM WEBSITE:
             {page_data}
             
@@ -58,28 +49,8 @@ class Chain:
             Only return the valid JSON.
             ### VALID JSON (NO PREAMBLE):
             """
-        )
-        chain_extract = prompt_extract | self.llm
-        try:
-            res = chain_extract.invoke(input={"page_data": cleaned_text, "institution_context": institution_context})
-            json_parser = JsonOutputParser()
-            parsed_res = json_parser.parse(res.content)
-            # Ensure it returns a list
-            if isinstance(parsed_res, dict) and 'jobs' in parsed_res:
-                return parsed_res['jobs']
-            elif isinstance(parsed_res, list):
-                return parsed_res
-            else:
-                return [parsed_res]
-        except OutputParserException:
-            # Fallback simple extraction if JSON fails
-            return [{"role": "General Technology Role", "experience": "Entry Level", "skills": ["Java", "Python", "Communication"], "description": "General hiring opportunity identified via web presence."}]
-        except Exception as e:
-            return []
 
-    def generate_company_report(self, company_name, search_snippets, institution_summary):
-        prompt_report = PromptTemplate.from_template(
-            """
+REPORT_TEMPLATE = """
             ### CONTEXT:
             You are a Senior Placement Officer (10+ years exp) analyzing a target company for a strategic partnership.
             
@@ -95,25 +66,8 @@ class Chain:
             Tone: Professional, Insightful, Strategic.
             ### REPORT (NO PREAMBLE):
             """
-        )
-        chain_report = prompt_report | self.llm
-        res = chain_report.invoke({
-            "company_name": company_name, 
-            "search_snippets": search_snippets,
-            "institution_summary": institution_summary
-        })
-        return res.content
 
-    def write_mail(self, job, links, user_details, recipient_details, intent, company_name, institution_summary=""):
-        # Handle case where it's a general institutional outreach (no specific job)
-        job_context = f"Company: {company_name}\n"
-        if job:
-            job_context += f"### TARGET ROLE IDENTIFIED:\n{str(job)}\n"
-        else:
-            job_context += "### FOCUS: Strategic Institutional Partnership & Pipeline Development\n"
-
-        prompt_email = PromptTemplate.from_template(
-            """
+EMAIL_TEMPLATE = """
             ### PERSONA: 
             You are {user_name}, a Senior Head of Corporate Relations at {institution_name} with over 10 years of experience in managing high-stakes campus placements and industrial MOUs. 
             You are NOT an assistant. You are a peer to HR Heads and Talent Acquisition Leaders.
@@ -140,9 +94,434 @@ class Chain:
             Tone: Highly professional, direct, and authoritative. 
             ### MASTER DRAFT (NO PREAMBLE):
             """
+
+INTELLIGENCE_TEMPLATE = """
+            ### CONTEXT:
+            You are a Senior Placement Officer (10+ years exp) analyzing a target company for a strategic partnership.
+            
+            Target Company: {company_name}
+            Search Snippets: {search_snippets}
+            My Institution ({institution_name}): {institution_summary}
+            
+            ### SCRAPED TEXT FROM CAREER PAGE OR SEARCH RESULTS:
+            {page_data}
+            
+            ### INSTRUCTION:
+            Return a JSON object with two keys:
+            - `report`: a brief, high-level executive summary (max 200 words, professional, insightful, strategic) answering:
+              1. What is this company's current strategic focus (digital transformation, AI, expansion, etc.)?
+              2. How does my institution's talent (e.g., CS, IT, Electronics students) fit into their future?
+            - `jobs`: a list of the open roles, strategic focus areas, or general hiring intent found in the scraped text.
+              Each job object must have: `role`, `experience`, `skills` (as a list), and `description`.
+              If no specific jobs are listed, infer the company's likely hiring needs based on the industry and scraped text.
+            
+            Only return the valid JSON.
+            ### VALID JSON (NO PREAMBLE):
+            """
+
+# Returned by summarize_institution when the model call fails
+SUMMARY_FALLBACK = "Institution summary unavailable due to analysis error."
+
+# Returned when the model answers extract_jobs with something that isn't JSON
+FALLBACK_JOB = {"role": "General Technology Role", "experience": "Entry Level", "skills": ["Java", "Python", "Communication"], "description": "General hiring opportunity identified via web presence."}
+
+# Scheduler lane per method when the Chain doesn't pin one: drafts the officer is waiting on go first
+METHOD_LANES = {
+    "summarize_institution": "interactive",
+    "generate_company_report": "interactive",
+    "company_intelligence": "interactive",
+    "write_mail": "interactive",
+    "extract_jobs": "background",
+    # Bulk campaigns queue behind single drafts so one officer's 50 contacts don't stall the others
+    "write_mails": "background",
+}
+
+# Rough completion sizes, added to the prompt estimate when reserving tokens per minute
+COMPLETION_TOKENS = {
+    "summarize_institution": 400,
+    "generate_company_report": 350,
+    "company_intelligence": 1500,
+    "write_mail": 500,
+    "write_mails": 500,
+    "extract_jobs": 1200,
+}
+
+class JobStreamInterrupted(Exception):
+    """stream_jobs broke off mid-answer; `jobs` were already yielded but are not the full list."""
+
+    def __init__(self, jobs, cause):
+        super().__init__(f"Job stream interrupted after {len(jobs)} job(s): {cause}")
+        self.jobs = jobs
+
+
+class LLMCache:
+    """Single-file SQLite cache of completions, keyed by prompt template, inputs, model and temperature."""
+
+    def __init__(self, path=None, ttl=7 * 24 * 3600, max_entries=5000):
+        self.path = path or os.getenv("LLM_CACHE_PATH", resources.data_path("llm_cache.sqlite3"))
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
         )
-        chain_email = prompt_email | self.llm
-        res = chain_email.invoke({
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(template, inputs, model, temperature):
+        # Inputs are hashed the way the prompt renders them, so dicts/lists of links key on their str()
+        rendered = {name: str(value) for name, value in inputs.items()}
+        payload = json.dumps([template, rendered, model, temperature], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row and (self.ttl is None or now - row[1] <= self.ttl):
+                self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self.hits += 1
+                telemetry.inc("cache_events_total", cache="llm", result="hit")
+                return row[0]
+            if row:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+            self.misses += 1
+            telemetry.inc("cache_events_total", cache="llm", result="miss")
+            return None
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            # Least recently used entries go first once the cache is over its size bound
+            overflow = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)",
+                    (overflow,),
+                )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+
+class Chain:
+    def __init__(self, api_key=None, cache=True, no_cache=(), llm=None, scheduler=True, lane=None):
+        # Use provided key or fallback to env
+        final_key = api_key or os.getenv("GROQ_API_KEY")
+        # scheduler=True shares the per-key rate-limit scheduler, an instance uses that one, False calls the model directly.
+        # lane pins every call to one scheduler lane (e.g. "batch"); by default it follows METHOD_LANES.
+        self.scheduler = get_scheduler(final_key) if scheduler is True else (scheduler or None)
+        self.lane = lane
+        # llm lets benchmarks and tests plug in any chat model with the same interface
+        self.llm = llm or ChatGroq(
+            temperature=0, 
+            groq_api_key=final_key, 
+            model_name="llama-3.3-70b-versatile",
+            # The scheduler owns retries, so the client shouldn't retry 429s behind its back
+            max_retries=0 if self.scheduler else 2
+        )
+        # cache=True uses the default on-disk cache, an LLMCache instance shares one, False disables it.
+        # no_cache lists method names (e.g. {"write_mail"}) that should always call the model.
+        self.cache = LLMCache() if cache is True else (cache or None)
+        self.no_cache = set(no_cache)
+
+    def _cache_key(self, method, template, inputs):
+        if self.cache is None or method in self.no_cache:
+            return None
+        return LLMCache.make_key(template, inputs, self.llm.model_name, self.llm.temperature)
+
+    def _admission(self, method, prompt, inputs):
+        lane = self.lane or METHOD_LANES.get(method, "background")
+        return lane, estimate_tokens(prompt.format(**inputs), COMPLETION_TOKENS.get(method, 500))
+
+    def _settle(self, estimated, usage):
+        if self.scheduler is not None and usage["prompt_tokens"] is not None:
+            self.scheduler.settle(estimated, usage["prompt_tokens"] + (usage["completion_tokens"] or 0))
+
+    def _run(self, method, template, inputs, cacheable=None):
+        with telemetry.span(f"llm.{method}") as span:
+            key = self._cache_key(method, template, inputs)
+            if key:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    span.set(cache="hit")
+                    return cached
+            prompt = PromptTemplate.from_template(template)
+            call = lambda: (prompt | self.llm).invoke(inputs)
+            if self.scheduler is not None:
+                lane, estimated = self._admission(method, prompt, inputs)
+                res = self.scheduler.run(call, estimated, lane)
+            else:
+                estimated, res = None, call()
+            usage = telemetry.record_llm_usage(method, res)
+            self._settle(estimated, usage)
+            span.set(cache="miss" if key else "off", **usage)
+            if key and (cacheable is None or cacheable(res.content)):
+                self.cache.set(key, res.content)
+            return res.content
+
+    async def _arun(self, method, template, inputs, cacheable=None):
+        with telemetry.span(f"llm.{method}") as span:
+            key = self._cache_key(method, template, inputs)
+            if key:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    span.set(cache="hit")
+                    return cached
+            prompt = PromptTemplate.from_template(template)
+            call = lambda: (prompt | self.llm).ainvoke(inputs)
+            if self.scheduler is not None:
+                lane, estimated = self._admission(method, prompt, inputs)
+                res = await self.scheduler.arun(call, estimated, lane)
+            else:
+                estimated, res = None, await call()
+            usage = telemetry.record_llm_usage(method, res)
+            self._settle(estimated, usage)
+            span.set(cache="miss" if key else "off", **usage)
+            if key and (cacheable is None or cacheable(res.content)):
+                self.cache.set(key, res.content)
+            return res.content
+
+    def _stream(self, method, template, inputs, cacheable=None):
+        with telemetry.span(f"llm.{method}", stream=True) as span:
+            key = self._cache_key(method, template, inputs)
+            if key:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    span.set(cache="hit")
+                    yield cached
+                    return
+            prompt = PromptTemplate.from_template(template)
+            chunks = lambda: (prompt | self.llm).stream(inputs)
+            estimated = None
+            if self.scheduler is not None:
+                lane, estimated = self._admission(method, prompt, inputs)
+                chunks = lambda open_stream=chunks: self.scheduler.stream(open_stream, estimated, lane)
+            final = None
+            for chunk in chunks():
+                if final is None:
+                    span.set(first_chunk_ms=round((time.perf_counter() - span.started) * 1000, 2))
+                    final = chunk
+                else:
+                    final = final + chunk
+                yield chunk.content
+            if final is not None:
+                usage = telemetry.record_llm_usage(method, final)
+                self._settle(estimated, usage)
+                span.set(cache="miss" if key else "off", **usage)
+                if key and (cacheable is None or cacheable(final.content)):
+                    self.cache.set(key, final.content)
+
+    async def _astream(self, method, template, inputs, cacheable=None):
+        with telemetry.span(f"llm.{method}", stream=True) as span:
+            key = self._cache_key(method, template, inputs)
+            if key:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    span.set(cache="hit")
+                    yield cached
+                    return
+            prompt = PromptTemplate.from_template(template)
+            chunks = lambda: (prompt | self.llm).astream(inputs)
+            estimated = None
+            if self.scheduler is not None:
+                lane, estimated = self._admission(method, prompt, inputs)
+                chunks = lambda open_stream=chunks: self.scheduler.astream(open_stream, estimated, lane)
+            final = None
+            async for chunk in chunks():
+                if final is None:
+                    span.set(first_chunk_ms=round((time.perf_counter() - span.started) * 1000, 2))
+                    final = chunk
+                else:
+                    final = final + chunk
+                yield chunk.content
+            if final is not None:
+                usage = telemetry.record_llm_usage(method, final)
+                self._settle(estimated, usage)
+                span.set(cache="miss" if key else "off", **usage)
+                if key and (cacheable is None or cacheable(final.content)):
+                    self.cache.set(key, final.content)
+
+    @staticmethod
+    def _parses(parse):
+        # Only well-formed answers are cached; a malformed one gets a fresh call next time.
+        # JsonOutputParser quietly repairs a truncated answer, so the raw JSON must load as-is too.
+        def check(content):
+            fenced = re.search(r"```(?:json)?(.*?)```", content, re.DOTALL)
+            try:
+                json.loads(fenced.group(1) if fenced else content)
+                parse(content)
+            except (ValueError, OutputParserException):
+                return False
+            return True
+        return check
+
+    def summarize_institution(self, cleaned_text):
+        try:
+            return self._run("summarize_institution", SUMMARY_TEMPLATE, {"page_data": cleaned_text})
+        except Exception as e:
+            # Running out of rate-limit retries is not an analysis error; let the caller report it
+            if classify(e) == "rate_limit":
+                raise
+            return SUMMARY_FALLBACK
+
+    def extract_jobs(self, cleaned_text, institution_context=""):
+        try:
+            content = self._run("extract_jobs", EXTRACT_TEMPLATE, {"page_data": cleaned_text, "institution_context": institution_context},
+                                cacheable=self._parses(self._parse_jobs))
+            return self._jobs_from(content)
+        except Exception as e:
+            if classify(e) == "rate_limit":
+                raise
+            return []
+
+    async def aextract_jobs(self, cleaned_text, institution_context=""):
+        # Same as extract_jobs, but awaits the model so batch runs can overlap calls
+        try:
+            content = await self._arun("extract_jobs", EXTRACT_TEMPLATE, {"page_data": cleaned_text, "institution_context": institution_context},
+                                       cacheable=self._parses(self._parse_jobs))
+            return self._jobs_from(content)
+        except Exception as e:
+            if classify(e) == "rate_limit":
+                raise
+            return []
+
+    def stream_jobs(self, cleaned_text, institution_context=""):
+        """Yields the jobs extract_jobs would return, each as soon as the model closes its JSON object.
+
+        If the stream breaks after it started, JobStreamInterrupted is raised once the jobs
+        parsed so far have been yielded.
+        """
+        parser = JsonArrayStream("jobs")
+        with telemetry.span("jobs.stream") as span:
+            try:
+                for chunk in self._stream("extract_jobs", EXTRACT_TEMPLATE, {"page_data": cleaned_text, "institution_context": institution_context},
+                                          cacheable=self._parses(self._parse_jobs)):
+                    jobs = parser.feed(chunk)
+                    if jobs and len(parser.items) == len(jobs):
+                        span.set(first_job_ms=round((time.perf_counter() - span.started) * 1000, 2))
+                    yield from jobs
+            except Exception as e:
+                if classify(e) == "rate_limit":
+                    raise
+                span.set(jobs=len(parser.items), interrupted=True)
+                raise JobStreamInterrupted(list(parser.items), e) from e
+            if not parser.items:
+                # No jobs array to stream from (a bare object, an empty list, or nothing usable)
+                yield from self._jobs_from(parser.text)
+            span.set(jobs=len(parser.items))
+
+    @classmethod
+    def _jobs_from(cls, content):
+        parser = JsonArrayStream("jobs")
+        parser.feed(content)
+        try:
+            jobs = cls._parse_jobs(content)
+        except OutputParserException:
+            # The placeholder only if not a single job object survived
+            return parser.items or [dict(FALLBACK_JOB)]
+        # JsonOutputParser "repairs" a broken answer by cutting it off at the first error;
+        # parsing job by job also keeps the complete ones after it
+        return parser.items if len(parser.items) > len(jobs) else jobs
+
+    @staticmethod
+    def _parse_jobs(content):
+        parsed_res = JsonOutputParser().parse(content)
+        # Ensure it returns a list
+        if isinstance(parsed_res, dict) and 'jobs' in parsed_res:
+            return parsed_res['jobs']
+        elif isinstance(parsed_res, list):
+            return parsed_res
+        else:
+            return [parsed_res]
+
+    def generate_company_report(self, company_name, search_snippets, institution_summary):
+        return self._run("generate_company_report", REPORT_TEMPLATE, {
+            "company_name": company_name, 
+            "search_snippets": search_snippets,
+            "institution_summary": institution_summary
+        })
+
+    async def agenerate_company_report(self, company_name, search_snippets, institution_summary):
+        return await self._arun("generate_company_report", REPORT_TEMPLATE, {
+            "company_name": company_name,
+            "search_snippets": search_snippets,
+            "institution_summary": institution_summary
+        })
+
+    def company_intelligence(self, company_name, search_snippets, page_data, institution_name, institution_summary):
+        # One call returning both the executive report and the jobs list; raises if the answer isn't usable
+        content = self._run("company_intelligence", INTELLIGENCE_TEMPLATE, {
+            "company_name": company_name,
+            "search_snippets": search_snippets,
+            "page_data": page_data,
+            "institution_name": institution_name,
+            "institution_summary": institution_summary
+        }, cacheable=self._parses(self._parse_intelligence))
+        return self._parse_intelligence(content)
+
+    async def acompany_intelligence(self, company_name, search_snippets, page_data, institution_name, institution_summary):
+        content = await self._arun("company_intelligence", INTELLIGENCE_TEMPLATE, {
+            "company_name": company_name,
+            "search_snippets": search_snippets,
+            "page_data": page_data,
+            "institution_name": institution_name,
+            "institution_summary": institution_summary
+        }, cacheable=self._parses(self._parse_intelligence))
+        return self._parse_intelligence(content)
+
+    @staticmethod
+    def _parse_intelligence(content):
+        parsed_res = JsonOutputParser().parse(content)
+        if not isinstance(parsed_res, dict) or not parsed_res.get('report'):
+            raise OutputParserException("Combined intelligence response is missing the report")
+        jobs = parsed_res.get('jobs') or []
+        return {"report": parsed_res['report'], "jobs": jobs if isinstance(jobs, list) else [jobs]}
+
+    def stream_company_report(self, company_name, search_snippets, institution_summary):
+        # Yields the report text chunk by chunk as the model produces it
+        return self._stream("generate_company_report", REPORT_TEMPLATE, {
+            "company_name": company_name,
+            "search_snippets": search_snippets,
+            "institution_summary": institution_summary
+        })
+
+    def astream_company_report(self, company_name, search_snippets, institution_summary):
+        return self._astream("generate_company_report", REPORT_TEMPLATE, {
+            "company_name": company_name,
+            "search_snippets": search_snippets,
+            "institution_summary": institution_summary
+        })
+
+    @staticmethod
+    def _mail_inputs(job, links, user_details, recipient_details, intent, company_name, institution_summary):
+        # Handle case where it's a general institutional outreach (no specific job)
+        job_context = f"Company: {company_name}\n"
+        if job:
+            job_context += f"### TARGET ROLE IDENTIFIED:\n{str(job)}\n"
+        else:
+            job_context += "### FOCUS: Strategic Institutional Partnership & Pipeline Development\n"
+
+        return {
             "job_context": job_context, 
             "company_name": company_name,
             "link_list": links,
@@ -154,8 +533,51 @@ class Chain:
             "recipient_name": recipient_details.get("name"),
             "recipient_designation": recipient_details.get("designation"),
             "intent": intent
-        })
-        return res.content
+        }
+
+    def write_mail(self, job, links, user_details, recipient_details, intent, company_name, institution_summary=""):
+        return self._run("write_mail", EMAIL_TEMPLATE, self._mail_inputs(
+            job, links, user_details, recipient_details, intent, company_name, institution_summary))
+
+    def stream_mail(self, job, links, user_details, recipient_details, intent, company_name, institution_summary=""):
+        # Streaming variant of write_mail; joining the chunks gives the same draft
+        return self._stream("write_mail", EMAIL_TEMPLATE, self._mail_inputs(
+            job, links, user_details, recipient_details, intent, company_name, institution_summary))
+
+    def astream_mail(self, job, links, user_details, recipient_details, intent, company_name, institution_summary=""):
+        return self._astream("write_mail", EMAIL_TEMPLATE, self._mail_inputs(
+            job, links, user_details, recipient_details, intent, company_name, institution_summary))
+
+    def _bulk_mail_inputs(self, job, links, user_details, recipients, intent, company_name, institution_summary):
+        # Job context and links are built once per company; only the recipient differs between drafts
+        shared = self._mail_inputs(job, links, user_details, {}, intent, company_name, institution_summary)
+        return [{**shared, "recipient_name": r.get("name"), "recipient_designation": r.get("designation")}
+                for r in recipients]
+
+    def write_mails(self, job, links, user_details, recipients, intent, company_name, institution_summary="",
+                    max_concurrency=4):
+        """Yield (index, draft, error) for each recipient as soon as its draft is done, in completion order."""
+        # Each draft still goes through the cache and the rate-limit scheduler; batch bounds the fan-out
+        runner = RunnableLambda(lambda inputs: self._run("write_mails", EMAIL_TEMPLATE, inputs))
+        inputs = self._bulk_mail_inputs(job, links, user_details, recipients, intent, company_name, institution_summary)
+        for index, result in runner.batch_as_completed(inputs, {"max_concurrency": max_concurrency}, return_exceptions=True):
+            if isinstance(result, Exception):
+                yield index, None, result
+            else:
+                yield index, result, None
+
+    async def awrite_mails(self, job, links, user_details, recipients, intent, company_name, institution_summary="",
+                           max_concurrency=4):
+        async def draft(inputs):
+            return await self._arun("write_mails", EMAIL_TEMPLATE, inputs)
+
+        runner = RunnableLambda(draft)
+        inputs = self._bulk_mail_inputs(job, links, user_details, recipients, intent, company_name, institution_summary)
+        async for index, result in runner.abatch_as_completed(inputs, {"max_concurrency": max_concurrency}, return_exceptions=True):
+            if isinstance(result, Exception):
+                yield index, None, result
+            else:
+                yield index, result, None
 
 if __name__ == "__main__":
     print(os.getenv("GROQ_API_KEY"))
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""Bounded crawl of a company's career site.
+
+Starting from the career URL picked from search, same-site pagination and job links are
+followed breadth-first, a few pages at a time, until the page, depth or time budget runs
+out or enough job text has been collected for extract_jobs. Pages go through the shared
+Fetcher, so they are cached and each host is only hit `per_host` at a time.
+"""
+import heapq
+import itertools
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit, urlunsplit
+
+import telemetry
+from extract import extract_links, html_to_text
+from fetch import get_fetcher
+from search import ATS_HOSTS, normalize_url
+
+MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "8"))
+MAX_DEPTH = int(os.getenv("CRAWL_MAX_DEPTH", "2"))
+# About twice what ranking.career_excerpt keeps, so it still has a choice of passages
+CHAR_BUDGET = int(os.getenv("CRAWL_CHAR_BUDGET", "48000"))
+TIME_BUDGET = float(os.getenv("CRAWL_TIME_BUDGET", "20"))
+# Shorter pages are menus or "job not found" stubs; their links are still followed
+MIN_PAGE_CHARS = 200
+LINKS_PER_PAGE = 12
+
+_SKIP_EXT_RE = re.compile(r"\.(pdf|jpe?g|png|gif|svg|webp|ico|zip|docx?|xlsx?|pptx?|mp[34]|css|js|xml|json|rss)$", re.I)
+_NOISE_RE = re.compile(r"log-?in|sign-?in|sign-?up|register|privacy|cookie|terms|legal|blog|news|press|investor|"
+                       r"facebook|twitter|linkedin|instagram|youtube", re.I)
+_JOB_RE = re.compile(r"jobs?|careers?|openings?|positions?|vacanc|requisition|opportunit|roles?|apply|hiring|intern", re.I)
+_PAGINATION_URL_RE = re.compile(r"[?&](page|pg|p|offset|start|from)=\d+|/page/\d+", re.I)
+_PAGINATION_TEXT_RE = re.compile(r"^(next( page)?|more( jobs)?|load more|older|show more|[›»>]+|next\s*[›»>]+|\d{1,3})$", re.I)
+# Country-code second-level domains, so careers.tcs.co.in and tcs.co.in count as one site
+_SECOND_LEVEL = {"co", "com", "org", "net", "ac", "gov", "edu"}
+
+
+def site_of(url):
+    labels = (urlsplit(url).hostname or "").lower().removeprefix("www.").split(".")
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in _SECOND_LEVEL:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def canonical_url(url):
+    # What gets fetched: no fragment, lower-case scheme and host, default ports dropped
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    return urlunsplit((parts.scheme.lower(), host, parts.path or "/", parts.query, ""))
+
+
+class _Scope:
+    """Which links belong to the start page's site (one company's board, on a shared ATS host)."""
+
+    def __init__(self, start_url):
+        parts = urlsplit(start_url)
+        self.host = (parts.hostname or "").lower()
+        self.site = site_of(start_url)
+        self.ats_prefix = None
+        if any(self.host == ats or self.host.endswith("." + ats) for ats in ATS_HOSTS):
+            first_segment = parts.path.strip("/").split("/")[0]
+            self.ats_prefix = f"/{first_segment}" if first_segment else ""
+
+    def contains(self, url):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            return False
+        if self.ats_prefix is not None:
+            return (parts.hostname or "").lower() == self.host and parts.path.startswith(self.ats_prefix)
+        return site_of(url) == self.site
+
+
+def link_score(href, text, scope):
+    """How worth following a link is: pagination 3, job listings/details 2, anything else None."""
+    if not scope.contains(href):
+        return None
+    path = urlsplit(href).path
+    if _SKIP_EXT_RE.search(path) or _NOISE_RE.search(path):
+        return None
+    if _PAGINATION_URL_RE.search(href) or _PAGINATION_TEXT_RE.match(text or ""):
+        return 3
+    if _JOB_RE.search(path) or _JOB_RE.search(text or ""):
+        return 2
+    return None
+
+
+def _fetch(fetcher, url):
+    return fetcher.fetch_page(url, html_to_text, extract_links)
+
+
+def crawl_career_site(start_url, max_pages=MAX_PAGES, max_depth=MAX_DEPTH, char_budget=CHAR_BUDGET,
+                      time_budget=TIME_BUDGET, workers=4):
+    """[(url, text)] for the start page and the job/pagination pages reachable from it, in fetch order."""
+    fetcher = get_fetcher()
+    scope = _Scope(start_url)
+    deadline = time.monotonic() + time_budget
+    seq = itertools.count()
+    seen = {normalize_url(start_url)}
+    frontier = [(0, 0, next(seq), canonical_url(start_url))]  # (depth, -score, seq, url)
+    pending = {}
+    pages, chars, fetched, stop = [], 0, 0, "exhausted"
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crawl")
+    with telemetry.span("crawl", url=start_url) as span:
+        try:
+            while frontier or pending:
+                while frontier and len(pending) < workers and fetched < max_pages:
+                    depth, _, _, url = heapq.heappop(frontier)
+                    pending[pool.submit(telemetry.bind(_fetch), fetcher, url)] = (url, depth)
+                    fetched += 1
+                if not pending:
+                    stop = "page_budget"
+                    break
+
+                done, _ = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+                if not done:
+                    stop = "time_budget"
+                    break
+                for future in done:
+                    url, depth = pending.pop(future)
+                    try:
+                        text, links = future.result()
+                    except Exception as e:
+                        print(f"Crawl error for {url}: {e}")
+                        continue
+                    if text and len(text) >= MIN_PAGE_CHARS:
+                        pages.append((url, text))
+                        chars += len(text)
+                    if depth >= max_depth:
+                        continue
+                    scored = [(score, href) for href, anchor in links or []
+                              if (score := link_score(href, anchor, scope)) is not None]
+                    scored.sort(key=lambda item: -item[0])
+                    for score, href in scored[:LINKS_PER_PAGE]:
+                        key = normalize_url(href)
+                        if key not in seen:
+                            seen.add(key)
+                            heapq.heappush(frontier, (depth + 1, -score, next(seq), canonical_url(href)))
+
+                if chars >= char_budget:
+                    stop = "enough_text"
+                    break
+        finally:
+            # Don't wait for stragglers past the budget; their results are simply dropped
+            pool.shutdown(wait=False, cancel_futures=True)
+        span.set(pages=len(pages), fetched=fetched, chars=chars, stop=stop)
+    return pages
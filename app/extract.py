@@ -0,0 +1,156 @@
+"""HTML -> cleaned text in a single pass.
+
+Drops the same elements the scraper always has (script, style, nav, footer, header, form)
+while parsing, instead of building a BeautifulSoup tree and decomposing them afterwards.
+The default engine is a streaming html.parser handler, which reproduces the old
+BeautifulSoup output and can also be fed a page chunk by chunk. lxml or selectolax, when
+installed, can be chosen with EXTRACT_BACKEND; they are faster but repair sloppy markup
+differently (`a</br>b` runs words together, a <td> outside any table, CDATA is dropped),
+which bench_extract.py reports.
+"""
+import os
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from utils import clean_text
+
+SKIP_TAGS = frozenset(["script", "style", "nav", "footer", "header", "form"])
+
+# Elements html.parser reports without an end tag; they never go on the open-element stack
+VOID_TAGS = frozenset(["area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+                       "meta", "param", "source", "track", "wbr"])
+
+
+class TextExtractor(HTMLParser):
+    """Collects text outside skipped elements as the document is fed in."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._open = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            return
+        self._open.append(tag)
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        # Like BeautifulSoup, an end tag closes everything opened after its start tag
+        if tag not in self._open:
+            return
+        while self._open:
+            opened = self._open.pop()
+            if opened in SKIP_TAGS:
+                self._skip_depth -= 1
+            if opened == tag:
+                break
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+    def unknown_decl(self, data):
+        # BeautifulSoup keeps CDATA sections as text
+        if data.startswith('CDATA['):
+            self.handle_data(data[len('CDATA['):])
+
+    def text(self):
+        return clean_text(' '.join(self.parts))
+
+
+def _extract_stdlib(html):
+    parser = TextExtractor()
+    parser.feed(html)
+    parser.close()
+    return parser.text()
+
+
+def _extract_selectolax(html):
+    tree = SelectolaxParser(html)
+    tree.strip_tags(list(SKIP_TAGS))
+    return clean_text(tree.root.text(separator=' ') if tree.root else '')
+
+
+def _extract_lxml(html):
+    parts = []
+    walker = etree.iterwalk(lxml_html.document_fromstring(html), events=("start", "end", "comment", "pi"))
+    for event, element in walker:
+        if event == "start":
+            if element.tag in SKIP_TAGS:
+                walker.skip_subtree()
+            elif element.text:
+                parts.append(element.text)
+        # Comments/PIs only contribute their tail, which is ordinary page text
+        elif element.tail:
+            parts.append(element.tail)
+    return clean_text(' '.join(parts))
+
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    SelectolaxParser = None
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:
+    lxml_html = None
+
+BACKENDS = {"html.parser": _extract_stdlib}
+if lxml_html is not None:
+    BACKENDS["lxml"] = _extract_lxml
+if SelectolaxParser is not None:
+    BACKENDS["selectolax"] = _extract_selectolax
+
+# The C engines are opt-in (EXTRACT_BACKEND=lxml or selectolax): their output isn't the old scraper's
+BACKEND = os.getenv("EXTRACT_BACKEND") or "html.parser"
+_extract = BACKENDS[BACKEND]
+
+
+def html_to_text(html):
+    if _extract is not _extract_stdlib and html.strip():
+        try:
+            return _extract(html)
+        except (ValueError, TypeError):
+            # e.g. lxml refusing str input with an XML encoding declaration
+            pass
+    return _extract_stdlib(html)
+
+
+class LinkExtractor(HTMLParser):
+    """(absolute href, anchor text) for every <a href> on the page, including ones in nav/footer."""
+
+    def __init__(self, base_url):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.links = []
+        self._current = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "base":
+            href = dict(attrs).get("href")
+            if href:
+                self.base_url = urljoin(self.base_url, href)
+        elif tag == "a":
+            href = dict(attrs).get("href")
+            if href and not href.startswith(("#", "mailto:", "tel:", "javascript:")):
+                self._current = [urljoin(self.base_url, href.strip()), []]
+                self.links.append(self._current)
+
+    def handle_endtag(self, tag):
+        if tag == "a":
+            self._current = None
+
+    def handle_data(self, data):
+        if self._current is not None:
+            self._current[1].append(data)
+
+
+def extract_links(html, base_url):
+    parser = LinkExtractor(base_url)
+    parser.feed(html)
+    parser.close()
+    return [(href, ' '.join(' '.join(text).split())) for href, text in parser.links]
@@ -0,0 +1,281 @@
+import codecs
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import resources
+import telemetry
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Referer': 'https://www.google.com/',
+}
+
+# Bodies are read in chunks and never past FETCH_MAX_BYTES (0 = no cap)
+MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(3 * 1024 * 1024)))
+# Reading also stops once this much text has been extracted (0 = never); the ranking excerpts
+# keep far less, and the crawl stops at CRAWL_CHAR_BUDGET for the whole site anyway
+MAX_TEXT_CHARS = int(os.getenv("FETCH_MAX_TEXT_CHARS", "50000"))
+PAGE_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+CHUNK_BYTES = 64 * 1024
+# Smaller bodies are only parsed once, at the end; past this the extracted text is measured at doubling sizes
+FIRST_CHECK_BYTES = 256 * 1024
+_META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset=["']?([\w.:-]+)""", re.I)
+
+
+class UnsupportedContent(ValueError):
+    """The response is not a page text can be extracted from (a PDF, an image, JSON...)."""
+
+
+def _encoding(response, head):
+    # An explicit header charset, else a <meta charset> near the top, else UTF-8
+    if "charset" in response.headers.get("Content-Type", "").lower() and response.encoding:
+        candidate = response.encoding
+    else:
+        match = _META_CHARSET_RE.search(head[:4096])
+        candidate = match.group(1).decode("ascii", "ignore") if match else "utf-8"
+    try:
+        return codecs.lookup(candidate).name
+    except LookupError:
+        return "utf-8"
+
+
+class ResponseCache:
+    """Extracted page text (and, for crawled pages, its links) per URL, plus the validators needed to revalidate it.
+
+    Entries not fetched or revalidated for `ttl` seconds are dropped, and past `max_entries`
+    the least recently validated ones go first.
+    """
+
+    def __init__(self, path=None, ttl=None, max_entries=None):
+        self.path = path or os.getenv("FETCH_CACHE_PATH", resources.data_path("fetch_cache.sqlite3"))
+        self.ttl = ttl if ttl is not None else int(os.getenv("FETCH_CACHE_TTL", str(7 * 24 * 3600)))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("FETCH_CACHE_MAX_ENTRIES", "5000"))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, text TEXT NOT NULL, fetched_at REAL NOT NULL, links TEXT)"
+        )
+        # Caches created before the crawler have no links column
+        if "links" not in {row[1] for row in self._conn.execute("PRAGMA table_info(responses)")}:
+            self._conn.execute("ALTER TABLE responses ADD COLUMN links TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_fetched ON responses (fetched_at)")
+        self._conn.commit()
+
+    def get(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, text, fetched_at, links FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None or time.time() - row[3] > self.ttl:
+            return None
+        return {"etag": row[0], "last_modified": row[1], "text": row[2], "fetched_at": row[3],
+                "links": json.loads(row[4]) if row[4] is not None else None}
+
+    def set(self, url, etag, last_modified, text, links=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (url, etag, last_modified, text, fetched_at, links) VALUES (?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, text, time.time(), json.dumps(links) if links is not None else None),
+            )
+            self._purge()
+            self._conn.commit()
+
+    def touch(self, url):
+        with self._lock:
+            self._conn.execute("UPDATE responses SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+    def _purge(self):
+        # Called with the lock held, on every write, so the file stays within its bounds
+        self._conn.execute("DELETE FROM responses WHERE fetched_at < ?", (time.time() - self.ttl,))
+        overflow = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE url IN (SELECT url FROM responses ORDER BY fetched_at LIMIT ?)",
+                (overflow,),
+            )
+
+
+class Fetcher:
+    """Shared pooled session with a per-host connection limit and ETag/Last-Modified revalidation.
+
+    Cached entries younger than `max_age` seconds are returned without touching the network;
+    older ones are revalidated and a 304 returns the stored text without re-parsing. Requests
+    to one host start at least `min_interval` seconds apart. Bodies are streamed: non-page
+    content types are refused before the body is read, and reading stops at `max_bytes` or
+    once `max_text_chars` of text has been extracted. With `check_url` (which raises to refuse
+    a URL), every URL, cached or not, and every redirect hop is vetted before it is requested.
+    """
+
+    def __init__(self, cache=None, pool_size=32, per_host=4, timeout=15, max_age=600, min_interval=None,
+                 max_bytes=MAX_BYTES, max_text_chars=MAX_TEXT_CHARS, check_url=None):
+        self.timeout = timeout
+        self.check_url = check_url
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.max_text_chars = max_text_chars
+        self.per_host = per_host
+        self.min_interval = float(os.getenv("FETCH_HOST_INTERVAL", "0.2")) if min_interval is None else min_interval
+        self.cache = cache if cache is not None else ResponseCache()
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=per_host)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._host_slots = {}
+        self._host_next = {}
+        self._host_lock = threading.Lock()
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._host_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
+
+    def _wait_turn(self, host):
+        # Politeness: at most one request start per host every min_interval seconds
+        if not self.min_interval:
+            return
+        with self._host_lock:
+            now = time.monotonic()
+            start = max(now, self._host_next.get(host, 0.0))
+            self._host_next[host] = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+
+    def _open(self, url, headers):
+        if self.check_url is None:
+            return self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+        # Redirects are followed here rather than by requests, so each hop's host is checked first
+        for _ in range(self.session.max_redirects + 1):
+            response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True, allow_redirects=False)
+            if not response.is_redirect:
+                return response
+            url = urljoin(response.url, response.headers["Location"])
+            response.close()
+            self.check_url(url)
+        raise requests.TooManyRedirects(f"Exceeded {self.session.max_redirects} redirects.")
+
+    def _read(self, response, extract):
+        """(html, text if already extracted else None, bytes read, why reading stopped)."""
+        decoder = None
+        parts, read, next_check = [], 0, FIRST_CHECK_BYTES
+        text, stop = None, "complete"
+        for chunk in response.iter_content(CHUNK_BYTES):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(_encoding(response, chunk))(errors="replace")
+            parts.append(decoder.decode(chunk))
+            read += len(chunk)
+            if self.max_bytes and read >= self.max_bytes:
+                stop = "byte_cap"
+                break
+            if self.max_text_chars and read >= next_check:
+                next_check *= 2
+                text = extract("".join(parts))
+                if len(text) >= self.max_text_chars:
+                    stop = "enough_text"
+                    break
+                text = None
+        if decoder is not None:
+            parts.append(decoder.decode(b"", final=True))
+        return "".join(parts), text, read, stop
+
+    def fetch_text(self, url, extract):
+        """Return extract(html) for url, reusing the cached result whenever the server allows it."""
+        return self._fetch(url, extract, None)[0]
+
+    def fetch_page(self, url, extract, extract_links):
+        """(extract(html), extract_links(html, url)) for url, cached like fetch_text."""
+        return self._fetch(url, extract, extract_links)
+
+    def _fetch(self, url, extract, extract_links):
+        host = urlsplit(url).netloc
+        if self.check_url is not None:
+            # Before the cache too: another process may have stored a page this one may not serve
+            self.check_url(url)
+        with telemetry.span("fetch", host=host) as span:
+            cached = self.cache.get(url)
+            # A page cached by fetch_text has no links; the crawler needs the body again
+            if cached and extract_links is not None and cached["links"] is None:
+                cached = None
+            if cached and time.time() - cached["fetched_at"] < self.max_age:
+                span.set(cache="fresh", bytes=0)
+                telemetry.inc("cache_events_total", cache="fetch", result="hit")
+                return cached["text"], cached["links"]
+
+            headers = {}
+            if cached and cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached and cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+            # The body is read inside the host slot too, so per_host still bounds downloads
+            with self._host_slot(url):
+                self._wait_turn(host.lower())
+                with self._open(url, headers) as response:
+                    span.set(status=response.status_code)
+                    if response.status_code == 304 and cached:
+                        span.set(cache="revalidated", bytes=0)
+                        telemetry.inc("cache_events_total", cache="fetch", result="hit")
+                        self.cache.touch(url)
+                        return cached["text"], cached["links"]
+                    response.raise_for_status()
+                    # Content-Length is what's on the wire (possibly compressed), as is raw.tell()
+                    length = int(response.headers.get("Content-Length") or 0)
+                    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                    if content_type and content_type not in PAGE_TYPES:
+                        span.set(bytes=0, stop="content_type", bytes_saved=length)
+                        telemetry.inc("fetch_bytes_saved_total", length)
+                        print(f"Fetch skipped {url}: {content_type}, {length or 'unknown'} bytes saved")
+                        raise UnsupportedContent(f"{content_type} is not a web page")
+                    html, text, read, stop = self._read(response, extract)
+                    saved = max(0, length - response.raw.tell()) if length and stop != "complete" else 0
+
+            # bytes_saved is None when the server didn't say how big the rest was
+            span.set(cache="miss", bytes=read, stop=stop, bytes_saved=saved if length or stop == "complete" else None)
+            telemetry.inc("fetch_bytes_total", read)
+            telemetry.inc("fetch_bytes_saved_total", saved)
+            telemetry.inc("cache_events_total", cache="fetch", result="miss")
+            if stop != "complete":
+                print(f"Fetch stopped early for {url} ({stop}): {read} bytes read, {saved if length else 'unknown'} bytes saved")
+
+            if text is None:
+                text = extract(html)
+            # Relative links resolve against where redirects actually landed
+            links = extract_links(html, response.url or url) if extract_links is not None else None
+            self.cache.set(url, response.headers.get("ETag"), response.headers.get("Last-Modified"), text, links)
+            return text, links
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+_check_url = None
+
+
+def get_fetcher():
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = Fetcher(check_url=_check_url)
+        return _fetcher
+
+
+def set_url_check(check):
+    """Make the shared fetcher vet every URL and redirect hop with check(url), which raises to refuse it."""
+    global _check_url
+    with _fetcher_lock:
+        _check_url = check
+        if _fetcher is not None:
+            _fetcher.check_url = check
@@ -0,0 +1,107 @@
+"""Jobs extracted per company, kept across sessions.
+
+Each company row stores a hash of exactly what extract_jobs was given, the jobs it returned
+and when they were first seen, last checked and last changed. A re-scan whose input hashes
+the same reuses the stored jobs instead of calling the model again.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import resources
+
+
+def content_hash(parts, institution_context=""):
+    digest = hashlib.sha256()
+    for part in [institution_context, *parts]:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()
+
+
+def _role_key(job):
+    return str(job.get("role", "") if isinstance(job, dict) else job).strip().casefold()
+
+
+def diff_jobs(old_jobs, new_jobs):
+    """Role names that appeared, disappeared, or kept their title but changed details."""
+    old = {_role_key(job): job for job in old_jobs}
+    new = {_role_key(job): job for job in new_jobs}
+    return {
+        "new": [new[k].get("role", k) if isinstance(new[k], dict) else k for k in new if k not in old],
+        "removed": [old[k].get("role", k) if isinstance(old[k], dict) else k for k in old if k not in new],
+        "changed": [new[k].get("role", k) if isinstance(new[k], dict) else k
+                    for k in new if k in old and json.dumps(new[k], sort_keys=True) != json.dumps(old[k], sort_keys=True)],
+    }
+
+
+class JobStore:
+    def __init__(self, path=None):
+        self.path = path or os.getenv("JOB_STORE_PATH", resources.data_path("job_store.sqlite3"))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS companies ("
+            "company TEXT PRIMARY KEY, display_name TEXT, career_url TEXT, content_hash TEXT NOT NULL, "
+            "jobs TEXT NOT NULL, first_seen REAL NOT NULL, checked_at REAL NOT NULL, changed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, company):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT display_name, career_url, content_hash, jobs, first_seen, checked_at, changed_at "
+                "FROM companies WHERE company = ?", (company,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"display_name": row[0], "career_url": row[1], "content_hash": row[2], "jobs": json.loads(row[3]),
+                "first_seen": row[4], "checked_at": row[5], "changed_at": row[6]}
+
+    def lookup(self, company, digest):
+        """Stored jobs plus an 'unchanged' change report if `digest` matches the last scan, else None."""
+        record = self.get(company)
+        if record is None or record["content_hash"] != digest:
+            return None
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE companies SET checked_at = ? WHERE company = ?", (now, company))
+            self._conn.commit()
+        changes = {"new": [], "removed": [], "changed": [], "unchanged": True, "first_scan": False,
+                   "previous_check": record["checked_at"], "changed_at": record["changed_at"]}
+        return record["jobs"], changes
+
+    def save(self, company, display_name, career_url, digest, jobs):
+        """Store a fresh extraction and return how it differs from the previous one."""
+        now = time.time()
+        previous = self.get(company)
+        changes = diff_jobs(previous["jobs"] if previous else [], jobs)
+        changed = previous is None or any(changes.values())
+        changes.update(unchanged=False, first_scan=previous is None,
+                       previous_check=previous["checked_at"] if previous else None,
+                       changed_at=now if changed else previous["changed_at"])
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO companies "
+                "(company, display_name, career_url, content_hash, jobs, first_seen, checked_at, changed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (company, display_name, career_url, digest, json.dumps(jobs),
+                 previous["first_seen"] if previous else now, now, changes["changed_at"]),
+            )
+            self._conn.commit()
+        return changes
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_job_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = JobStore()
+        return _store
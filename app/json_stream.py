@@ -0,0 +1,71 @@
+"""Incremental parsing of one JSON array out of a streamed model answer.
+
+Feed the text as it arrives; every object in the array under `key` (or in a top-level
+array) comes back from feed() as soon as its closing brace does. Elements are parsed one
+at a time, so output that goes wrong later on can't take back the ones already closed.
+"""
+import json
+
+
+class JsonArrayStream:
+    def __init__(self, key="jobs"):
+        self.key = key
+        self.text = ""
+        self.items = []
+        self.closed = False
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._array_depth = None
+        self._item_start = None
+
+    def feed(self, chunk):
+        """Objects of the array completed by this chunk, in order."""
+        self.text += chunk
+        text = self.text
+        found = []
+        for i in range(self._pos, len(text)):
+            if self.closed:
+                break
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start + 1:i]
+                continue
+            # Preamble and code fences before the JSON starts
+            if not self._stack and ch not in "{[":
+                continue
+            if ch == '"':
+                self._in_string, self._string_start = True, i
+            elif ch in "{[":
+                if ch == "[" and self._array_depth is None and (
+                        not self._stack or (self._stack == ["{"] and self._last_string == self.key)):
+                    self._array_depth = len(self._stack) + 1
+                elif ch == "{" and len(self._stack) == self._array_depth:
+                    self._item_start = i
+                self._stack.append(ch)
+            elif ch in "}]" and self._stack:
+                self._stack.pop()
+                if self._array_depth is None:
+                    continue
+                if ch == "}" and self._item_start is not None and len(self._stack) == self._array_depth:
+                    try:
+                        item = json.loads(text[self._item_start:i + 1])
+                    except ValueError:
+                        item = None
+                    self._item_start = None
+                    if isinstance(item, dict):
+                        found.append(item)
+                elif ch == "]" and len(self._stack) == self._array_depth - 1:
+                    self.closed = True
+        self._pos = len(text)
+        self.items.extend(found)
+        return found
@@ -2,17 +2,28 @@ import streamlit as st
 import traceback
 import time
 import os
+import json
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # Load environment variables explicitly from the project root
 load_dotenv(override=True)
 key = os.getenv("GROQ_API_KEY")
 
-from utils import clean_text
+import resources
+import telemetry
+from pipeline import (institution_profile, search_company, pick_career_url, format_snippets,
+                      build_institution_context, scan_company_jobs, company_intelligence,
+                      COMPANY_SEARCHES, search_key, parse_recipients, DraftArchive)
+from profile_store import get_profile_store
 
 # Set Page Config
 st.set_page_config(layout="wide", page_title="Company Outreach Generator", page_icon="🏫")
 
+# Heavy libraries load in the background while the landing/setup pages render
+resources.start_warmup()
+
 # Check for API Key
 if not key:
     st.error("⚠️ GROQ_API_KEY not found in environment variables. Please add it to your .env file.")
@@ -105,74 +116,92 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Scraping Helper
-def scrape_page_content(url):
-    try:
-        import requests
-        from bs4 import BeautifulSoup
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Referer': 'https://www.google.com/',
-        }
-        
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        for element in soup(["script", "style", "nav", "footer", "header", "form"]):
-            element.decompose()
-            
-        text = soup.get_text(separator=' ')
-        cleaned = clean_text(text)
-        
-        if len(cleaned) < 500:
-            return None
-            
-        return cleaned
-    except Exception as e:
-        print(f"Scraping Error for {url}: {e}")
-        return None
-
-def process_institution_url(chain, url):
-    cleaned = scrape_page_content(url)
-    if cleaned:
-        return chain.summarize_institution(cleaned[:10000]) 
-    return None
-
 # Navigation Flows
 def go_to_setup():
     st.session_state.page = 'setup'
 
 # Resource Caching for Performance and Startup
-# @st.cache_resource
+# One Chain (and Groq client) per API key and one portfolio index per process, shared across reruns and sessions
+@st.cache_resource(show_spinner=False)
+def _load_chain(api_key):
+    with resources.timed("init chain"):
+        Chain = resources.lazy_import("chains").Chain
+        return Chain(api_key=api_key)
+
+@st.cache_resource(show_spinner=False)
+def _load_portfolio():
+    with resources.timed("init portfolio"):
+        portfolio = resources.lazy_import("portfolio").Portfolio()
+        portfolio.load_portfolio()
+        return portfolio
+
 def get_chain(api_key=None):
-    """Refreshed version 1.0.1"""
     try:
-        from chains import Chain
-        key = api_key or os.getenv("GROQ_API_KEY")
-        # Force reload of the module if needed, but usually creating a new instance is enough if the file changed
-        import importlib
-        import chains
-        importlib.reload(chains)
-        from chains import Chain
-        return Chain(api_key=key)
+        return _load_chain(api_key or os.getenv("GROQ_API_KEY"))
     except Exception as e:
         st.error(f"Error initializing Chain: {e}")
         return None
 
-# @st.cache_resource
 def get_portfolio():
     try:
-        from portfolio import Portfolio
-        return Portfolio()
+        return _load_portfolio()
     except Exception as e:
         st.error(f"Error initializing Portfolio: {e}")
         return None
 
+def outreach_links(portfolio):
+    # Portfolio links for the selected role, or for the institution's profile when pitching in general
+    job = st.session_state.get('selected_job')
+    skills = job.get('skills', []) if job else st.session_state.institution_summary.split()[:5]
+    return portfolio.query_links(skills)
+
+def describe_job_changes(changes):
+    if not changes or changes['first_scan']:
+        return None
+    since = time.strftime("%d %b %Y", time.localtime(changes['previous_check']))
+    if changes['unchanged']:
+        return f"🗂 Careers content unchanged since {since}; saved roles reused."
+    summary = [f"{len(changes[kind])} {kind}: {', '.join(map(str, changes[kind][:5]))}"
+               for kind in ("new", "removed", "changed") if changes[kind]]
+    return f"🔄 Since {since}: " + "; ".join(summary) if summary else f"🔄 Re-checked since {since}; same roles."
+
+def render_found_jobs(found, container, shown=0, until=None):
+    """Preview expanders for jobs queued so far by the extraction thread; with `until` (its future), wait for the rest."""
+    while True:
+        try:
+            job = found.get(timeout=0.1) if until else found.get_nowait()
+        except queue.Empty:
+            if until is None:
+                return shown
+            if until.done():
+                # One last pass for anything queued just before it finished
+                until = None
+            continue
+        with container.expander(f"📋 {job.get('role', 'Opportunity')}", expanded=(shown == 0)):
+            st.write(f"**Brief:** {job.get('description', 'N/A')}")
+            st.write(f"**Skills:** {job.get('skills', 'N/A')}")
+        shown += 1
+
+def render_report(company, report):
+    st.subheader(f"📊 Market Analysis: {company}")
+    st.markdown(f'<div class="job-card">{report}</div>', unsafe_allow_html=True)
+
+def render_waterfall(trace, width=24):
+    if not trace:
+        st.caption("No request traced yet.")
+        return
+    total = trace['duration_ms'] or 1
+    st.caption(f"Last request: {trace['name']} · {total / 1000:.2f}s")
+    rows = []
+    for span in trace['spans']:
+        offset = int(span['start_ms'] / total * width)
+        bar = ("·" * offset + "█" * max(1, round(span['duration_ms'] / total * width))).ljust(width + 1)
+        details = ", ".join(f"{k}={v}" for k, v in span['attrs'].items() if k not in ("url", "company") and v is not None)
+        rows.append(f"`{bar}` **{span['name']}** {span['duration_ms']:.0f} ms" + (f" · {details}" if details else ""))
+    st.markdown("  \n".join(rows))
+    st.download_button("Trace (JSONL)", json.dumps(trace, default=str) + "\n", file_name="trace.jsonl", use_container_width=True)
+    st.download_button("Metrics (Prometheus)", telemetry.prometheus_text(), file_name="metrics.prom", use_container_width=True)
+
 def main():
     # LANDING PAGE
     if st.session_state.page == 'landing':
@@ -190,15 +219,25 @@ def main():
     elif st.session_state.page == 'setup':
         st.markdown('<div class="css-card"><h2>Institutional Profile Setup</h2></div>', unsafe_allow_html=True)
         
+        saved_profiles = get_profile_store().list()
         with st.form("user_setup_form"):
             name = st.text_input("Your Full Name (e.g. Prof. Mohan Kumar)")
             designation = st.text_input("Your Designation (e.g. Head of Corporate Relations)")
+            saved = None
+            if saved_profiles:
+                # A saved institution skips the scraper entirely; its summary is refreshed in the background when old
+                saved = st.selectbox("Saved Institution (optional)", [None] + saved_profiles,
+                                     format_func=lambda p: "— Enter a new institution below —" if p is None
+                                     else f"{p['institution_name'] or p['url']} · analysed {time.strftime('%d %b %Y', time.localtime(p['updated_at']))}")
             inst_name = st.text_input("Institution Name")
             inst_url = st.text_input("Institution Website URL")
             
             submitted = st.form_submit_button("Continue to Engine")
             
             if submitted:
+                if saved and not inst_url:
+                    inst_name = inst_name or saved['institution_name']
+                    inst_url = saved['url']
                 if name and designation and inst_name and inst_url:
                     st.session_state.user_details = {
                         "name": name,
@@ -210,10 +249,25 @@ def main():
                     chain = get_chain()
                     if chain:
                         with st.status("Analyzing Institution Workforce Pipeline...") as status:
-                            summary = process_institution_url(chain, inst_url)
-                            if summary:
-                                st.session_state.institution_summary = summary
-                                status.update(label="✅ Institution Analysis Complete", state="complete")
+                            with telemetry.trace("institution_setup", url=inst_url) as trace:
+                                try:
+                                    profile = institution_profile(chain, inst_url, inst_name)
+                                except Exception as e:
+                                    profile = False
+                                    st.error(f"Institution analysis failed: {e}")
+                                trace.attrs["cached"] = bool(profile and profile['cached'])
+                            st.session_state.last_trace = trace.to_dict()
+                            if profile is False:
+                                status.update(label="❌ Institution Analysis Failed", state="error")
+                            elif profile:
+                                st.session_state.institution_summary = profile['summary']
+                                if profile['refreshing']:
+                                    label = "✅ Saved Profile Loaded (refreshing in background)"
+                                elif profile['cached']:
+                                    label = "✅ Saved Profile Loaded"
+                                else:
+                                    label = "✅ Institution Analysis Complete"
+                                status.update(label=label, state="complete")
                                 time.sleep(1)
                                 st.session_state.page = 'main'
                                 st.rerun()
@@ -240,6 +294,15 @@ def main():
             if st.button("🔄 Edit Profile", use_container_width=True):
                 st.session_state.page = 'setup'
                 st.rerun()
+            st.checkbox("Single-call intelligence", key="fused_intelligence",
+                        help="Fetch the market report and vacancies in one model call (fewer tokens, no live streaming).")
+            with st.expander("⏱ Startup Timings"):
+                st.json(resources.startup_report())
+            if chain.scheduler is not None:
+                with st.expander("🚦 Groq Queue"):
+                    st.json(chain.scheduler.stats())
+            if st.checkbox("Show timing waterfall", key="show_waterfall"):
+                render_waterfall(st.session_state.get('last_trace'))
 
         st.title("Strategic Opportunities")
         portfolio.load_portfolio()
@@ -250,56 +313,82 @@ def main():
         with col2:
             search_trigger = st.button("Search Intelligence", use_container_width=True)
 
+        # The results area is laid out before the search runs so the report and vacancies stream into
+        # the same slots that show them afterwards, outside the (collapsed) status box. Vacancies and
+        # the outreach form below are never shown together, so their order doesn't matter.
+        search_area = st.container()
+        report_slot = st.empty()
+        vacancy_slot = st.empty()
+
         if search_trigger and company_query:
             company_query = company_query.strip()
             display_name = company_query.title()
             st.session_state.display_name = display_name
             
-            with st.status(f"Scanning Global Opportunities for {display_name}...") as status:
-                try:
-                    from ddgs import DDGS
-                    inst_name = st.session_state.user_details.get('institution_name', '')
-                    
-                    with DDGS() as ddgs:
-                        # Multi-Stage Search
-                        results_raw = list(ddgs.text(f"{display_name} careers jobs openings", max_results=8))
-                        if not results_raw:
-                            results_raw = list(ddgs.text(f"{display_name} careers", max_results=5))
-                    
-                    if results_raw:
-                        snippets = "\n".join([f"- {res['title']}: {res['body']}" for res in results_raw[:5]])
-                        report = chain.generate_company_report(display_name, snippets, st.session_state.institution_summary)
-                        st.session_state.current_report = report
-                        
-                        career_url = next((res['href'] for res in results_raw if 'career' in res['href'].lower() or 'job' in res['href'].lower()), results_raw[0]['href'])
-                        st.session_state.current_url = career_url
-                        
-                        data = scrape_page_content(career_url)
-                        inst_context = f"Institution: {inst_name}. Summary: {st.session_state.institution_summary}. Company: {display_name}."
-                        
-                        if data and len(data) > 300:
-                            jobs = chain.extract_jobs(data, institution_context=inst_context)
+            with search_area.status(f"Scanning Global Opportunities for {display_name}...") as status:
+                with telemetry.trace("company_search", company=display_name) as trace:
+                    try:
+                        inst_name = st.session_state.user_details.get('institution_name', '')
+                        summary = st.session_state.institution_summary
+                        fused = bool(st.session_state.get('fused_intelligence'))
+
+                        def run_search():
+                            results_raw = search_company(display_name)
+                            if not results_raw:
+                                return None
+                            career_url = pick_career_url(results_raw, display_name)
+                            if fused:
+                                intel = company_intelligence(chain, display_name, results_raw, inst_name, summary, fused=True)
+                                with report_slot.container():
+                                    render_report(display_name, intel['report'])
+                                return intel
+                            # Scrape + extraction runs alongside the streamed report instead of after it,
+                            # and each role is shown as soon as the model has written it
+                            inst_context = build_institution_context(inst_name, summary, display_name)
+                            found = queue.Queue()
+                            vacancies = vacancy_slot.container()
+                            vacancies.divider()
+                            vacancies.write(f"### Specific Vacancies at {display_name}")
+                            with ThreadPoolExecutor(max_workers=1) as pool:
+                                jobs_future = pool.submit(telemetry.bind(scan_company_jobs), chain, display_name, results_raw,
+                                                          career_url, inst_context, on_job=found.put)
+                                report, shown = "", 0
+                                for chunk in chain.stream_company_report(display_name, format_snippets(results_raw), summary):
+                                    report += chunk
+                                    with report_slot.container():
+                                        render_report(display_name, report)
+                                    shown = render_found_jobs(found, vacancies, shown)
+                                status.update(label=f"Report ready; extracting roles for {display_name}...")
+                                render_found_jobs(found, vacancies, shown, until=jobs_future)
+                                jobs, changes = jobs_future.result()
+                                return {"career_url": career_url, "report": report, "jobs": jobs, "changes": changes}
+
+                        intel, shared = COMPANY_SEARCHES.do(search_key(display_name, summary, fused), run_search)
+                        trace.attrs["shared"] = shared
+                        if intel:
+                            st.session_state.current_url = intel['career_url']
+                            st.session_state.current_report = intel['report']
+                            st.session_state.search_results = intel['jobs']
+                            st.session_state.job_changes = intel.get('changes')
+                            status.update(label=f"✅ {display_name} Intelligence Ready", state="complete")
                         else:
-                            fallback_data = "\n".join([f"Title: {res['title']}\nSnippet: {res['body']}" for res in results_raw])
-                            jobs = chain.extract_jobs(fallback_data, institution_context=inst_context)
-                        
-                        st.session_state.search_results = jobs
-                        status.update(label=f"✅ {display_name} Intelligence Ready", state="complete")
-                    else:
-                        st.error(f"Unable to locate career data for {display_name}.")
-                except Exception as e:
-                    st.error(f"Intelligence failure: {e}")
+                            st.error(f"Unable to locate career data for {display_name}.")
+                    except Exception as e:
+                        st.error(f"Intelligence failure: {e}")
+                st.session_state.last_trace = trace.to_dict()
 
         # PERSISTENT DISPLAY
         if st.session_state.get('current_report'):
-            st.subheader(f"📊 Market Analysis: {st.session_state.display_name}")
-            st.markdown(f'<div class="job-card">{st.session_state.current_report}</div>', unsafe_allow_html=True)
-            
-            if st.button("Draft Executive Outreach Email", use_container_width=True):
-                st.session_state.selected_job = None
-                st.session_state.outreach_mode = True
-                st.session_state.generated_mail = None
-                st.rerun()
+            # Replaces whatever was streamed into the slot during this run
+            with report_slot.container():
+                render_report(st.session_state.display_name, st.session_state.current_report)
+
+                if st.button("Draft Executive Outreach Email", use_container_width=True):
+                    st.session_state.selected_job = None
+                    st.session_state.outreach_mode = True
+                    st.session_state.generated_mail = None
+                    st.session_state.bulk_zip = None
+                    st.rerun()
 
         if st.session_state.get('outreach_mode'):
             st.divider()
@@ -324,21 +413,71 @@ def main():
                     if not rec_name:
                         st.error("Recipient name is required for executive persona.")
                     else:
-                        with st.spinner("Drafting as Senior TPO..."):
-                            skills = st.session_state.selected_job.get('skills', []) if st.session_state.get('selected_job') else st.session_state.institution_summary.split()[:5]
-                            links = portfolio.query_links(skills)
-                            email = chain.write_mail(
-                                job=st.session_state.selected_job,
-                                links=links,
-                                user_details=st.session_state.user_details,
-                                recipient_details={"name": rec_name, "designation": rec_desg},
-                                intent=intent,
-                                company_name=st.session_state.display_name,
-                                institution_summary=st.session_state.institution_summary
-                            )
-                            if email:
-                                st.session_state.generated_mail = email
-                                st.rerun()
+                        with telemetry.trace("draft_email", company=st.session_state.display_name) as trace:
+                            with st.spinner("Drafting as Senior TPO..."):
+                                links = outreach_links(portfolio)
+                            # Render the draft as it is generated instead of waiting for the full completion
+                            try:
+                                email = st.write_stream(chain.stream_mail(
+                                    job=st.session_state.selected_job,
+                                    links=links,
+                                    user_details=st.session_state.user_details,
+                                    recipient_details={"name": rec_name, "designation": rec_desg},
+                                    intent=intent,
+                                    company_name=st.session_state.display_name,
+                                    institution_summary=st.session_state.institution_summary
+                                ))
+                            except Exception as e:
+                                email = None
+                                st.error(f"Drafting failed: {e}")
+                        st.session_state.last_trace = trace.to_dict()
+                        if email:
+                            st.session_state.generated_mail = email
+                            st.rerun()
+
+            with st.expander("📬 Bulk Drafts from Recipient CSV"):
+                st.caption("One draft per row. Columns: `name`, plus optional `designation` and `email`.")
+                with st.form("bulk_outreach_form"):
+                    recipients_file = st.file_uploader("Recipient CSV", type=["csv"])
+                    bulk_intent = st.selectbox("Strategic Intent",
+                                               ["Campus Hiring Drive 2024-25", "Student Internships", "MOU & Partnerships"],
+                                               key="bulk_intent")
+                    bulk_btn = st.form_submit_button("Generate All Drafts")
+
+                if bulk_btn and recipients_file is not None:
+                    try:
+                        recipients = parse_recipients(recipients_file.getvalue().decode("utf-8-sig"))
+                    except (ValueError, UnicodeDecodeError) as e:
+                        recipients = []
+                        st.error(f"Could not read recipients: {e}")
+                    if recipients:
+                        with telemetry.trace("bulk_draft", company=st.session_state.display_name, recipients=len(recipients)) as trace:
+                            links = outreach_links(portfolio)
+                            archive = DraftArchive()
+                            progress = st.progress(0.0, text=f"Drafting 0/{len(recipients)}...")
+                            failed = []
+                            for done, (index, draft, error) in enumerate(chain.write_mails(
+                                    job=st.session_state.selected_job,
+                                    links=links,
+                                    user_details=st.session_state.user_details,
+                                    recipients=recipients,
+                                    intent=bulk_intent,
+                                    company_name=st.session_state.display_name,
+                                    institution_summary=st.session_state.institution_summary), start=1):
+                                if draft:
+                                    archive.add(index, recipients[index], draft)
+                                else:
+                                    failed.append(f"{recipients[index]['name']}: {error}")
+                                progress.progress(done / len(recipients), text=f"Drafting {done}/{len(recipients)} · {recipients[index]['name']} done")
+                            st.session_state.bulk_zip = archive.close()
+                        st.session_state.last_trace = trace.to_dict()
+                        for failure in failed:
+                            st.warning(f"Draft failed for {failure}")
+
+                if st.session_state.get('bulk_zip'):
+                    st.download_button("🗂 Download All Drafts (.zip)", st.session_state.bulk_zip,
+                                       file_name=f"{st.session_state.display_name}_drafts.zip", mime="application/zip",
+                                       use_container_width=True)
 
             if st.session_state.get('generated_mail'):
                 st.text_area("Final Executive Draft", value=st.session_state.generated_mail, height=450, key="final_outreach_text")
@@ -347,20 +486,29 @@ def main():
                 if st.button("New Action / Clear", use_container_width=True):
                     st.session_state.outreach_mode = False
                     st.session_state.generated_mail = None
+                    st.session_state.bulk_zip = None
                     st.rerun()
 
         if st.session_state.search_results and not st.session_state.get('outreach_mode'):
-            st.divider()
-            st.write(f"### Specific Vacancies at {st.session_state.display_name}")
-            for idx, job in enumerate(st.session_state.search_results):
-                with st.expander(f"📋 {job.get('role', 'Opportunity')}", expanded=(idx==0)):
-                    st.write(f"**Brief:** {job.get('description', 'N/A')}")
-                    st.write(f"**Skills:** {job.get('skills', 'N/A')}")
-                    if st.button(f"Draft Pitch for this Role", key=f"job_btn_{idx}"):
-                         st.session_state.selected_job = job
-                         st.session_state.outreach_mode = True
-                         st.session_state.generated_mail = None
-                         st.rerun()
+            # Replaces the previews streamed in during this run with the full list and its buttons
+            with vacancy_slot.container():
+                st.divider()
+                st.write(f"### Specific Vacancies at {st.session_state.display_name}")
+                changes_note = describe_job_changes(st.session_state.get('job_changes'))
+                if changes_note:
+                    st.info(changes_note)
+                for idx, job in enumerate(st.session_state.search_results):
+                    with st.expander(f"📋 {job.get('role', 'Opportunity')}", expanded=(idx==0)):
+                        st.write(f"**Brief:** {job.get('description', 'N/A')}")
+                        st.write(f"**Skills:** {job.get('skills', 'N/A')}")
+                        if st.button(f"Draft Pitch for this Role", key=f"job_btn_{idx}"):
+                             st.session_state.selected_job = job
+                             st.session_state.outreach_mode = True
+                             st.session_state.generated_mail = None
+                             st.session_state.bulk_zip = None
+                             st.rerun()
+        else:
+            vacancy_slot.empty()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,345 @@
+# Shared company-intelligence steps used by both the Streamlit page and the batch runner
+import csv
+import hashlib
+import io
+import os
+import re
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import telemetry
+from job_store import content_hash, get_job_store
+from profile_store import get_profile_store, institution_key
+from scheduler import classify
+from search import search_company, pick_career_url
+from singleflight import SingleFlight
+from utils import scrape_page_content
+
+# Identical lookups running at the same time (two officers, a double click) share one pipeline run,
+# and a repeat within SEARCH_MEMO_TTL seconds is answered from memory
+COMPANY_SEARCHES = SingleFlight("company_search", ttl=int(os.getenv("SEARCH_MEMO_TTL", "60")))
+
+
+# Large career sites can be extracted in several calls (one per group of crawled pages) instead of one
+EXTRACT_CHUNKS = int(os.getenv("CRAWL_EXTRACT_CHUNKS", "1"))
+
+
+def normalize_company(display_name):
+    return " ".join(re.sub(r"[^\w\s]", " ", display_name.casefold()).split())
+
+
+def search_key(display_name, institution_summary, fused=False):
+    # Single-call and two-call runs produce different reports, so they never share a result
+    name = normalize_company(display_name)
+    summary_hash = hashlib.sha256((institution_summary or "").encode("utf-8")).hexdigest()[:16]
+    return f"{name}:{'fused' if fused else 'split'}:{summary_hash}"
+
+
+def _institution_excerpt(url):
+    cleaned = scrape_page_content(url)
+    if cleaned:
+        from ranking import institution_excerpt
+
+        # Most relevant passages up to the token budget rather than the first 10k characters
+        return institution_excerpt(cleaned)
+    return None
+
+
+def refresh_institution_profile(chain, url, institution_name=""):
+    """Re-scrape the institution and summarise it again only if the page content changed."""
+    from chains import SUMMARY_FALLBACK
+
+    store = get_profile_store()
+    key = institution_key(url)
+    excerpt = _institution_excerpt(url)
+    profile = store.get(key)
+    if not excerpt:
+        return profile
+    digest = content_hash([excerpt])
+    if profile and profile["content_hash"] == digest:
+        store.touch(key)
+        return store.get(key)
+    summary = chain.summarize_institution(excerpt)
+    if summary == SUMMARY_FALLBACK:
+        return profile
+    store.save(key, url, institution_name or (profile or {}).get("institution_name") or "", digest, summary)
+    return store.get(key)
+
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def _refresh_in_background(chain, url, institution_name):
+    key = institution_key(url)
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def run():
+        try:
+            with telemetry.span("profile.refresh", url=url):
+                refresh_institution_profile(chain, url, institution_name)
+        except Exception as e:
+            print(f"Institution profile refresh failed for {url}: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    threading.Thread(target=run, name="profile-refresh", daemon=True).start()
+
+
+def institution_profile(chain, url, institution_name=""):
+    """Saved profile for the institution (None if it can't be analysed).
+
+    A known institution comes back at once; if its profile is older than PROFILE_MAX_AGE
+    it is also refreshed on a background thread, marked by `refreshing` in the result.
+    """
+    store = get_profile_store()
+    profile = store.get(institution_key(url))
+    if profile is None:
+        profile = refresh_institution_profile(chain, url, institution_name)
+        return dict(profile, cached=False, refreshing=False) if profile else None
+    stale = store.is_stale(profile)
+    if stale:
+        _refresh_in_background(chain, url, institution_name)
+    return dict(profile, cached=True, refreshing=stale)
+
+
+def format_snippets(results_raw):
+    return "\n".join([f"- {res['title']}: {res['body']}" for res in results_raw[:5]])
+
+
+def format_fallback(results_raw):
+    # Used for extraction when the career page can't be scraped
+    return "\n".join([f"Title: {res['title']}\nSnippet: {res['body']}" for res in results_raw])
+
+
+def build_institution_context(inst_name, institution_summary, display_name):
+    return f"Institution: {inst_name}. Summary: {institution_summary}. Company: {display_name}."
+
+
+def _split_pages(pages, parts):
+    # Consecutive pages into exactly `parts` non-empty groups (at most one per page), choosing the
+    # cut points that keep the largest group's text as small as possible
+    parts = min(parts, len(pages))
+    prefix = [0]
+    for _, text in pages:
+        prefix.append(prefix[-1] + len(text))
+    n = len(pages)
+    # largest[k][i]: smallest possible largest group for the first i pages in k groups; cut[k][i]: where the last starts
+    largest = [[float("inf")] * (n + 1) for _ in range(parts + 1)]
+    cut = [[0] * (n + 1) for _ in range(parts + 1)]
+    largest[0][0] = 0
+    for k in range(1, parts + 1):
+        for i in range(k, n + 1):
+            for j in range(k - 1, i):
+                size = max(largest[k - 1][j], prefix[i] - prefix[j])
+                if size < largest[k][i]:
+                    largest[k][i], cut[k][i] = size, j
+    groups, end = [], n
+    for k in range(parts, 0, -1):
+        start = cut[k][end]
+        groups.append(" ".join(text for _, text in pages[start:end]))
+        end = start
+    return groups[::-1]
+
+
+def gather_job_chunks(results_raw, career_url, chunks=1):
+    """Up to `chunks` extract_jobs inputs from the crawled career site, each within the token budget.
+
+    Falls back to the search snippets when nothing usable could be crawled.
+    """
+    from crawler import crawl_career_site
+
+    pages = crawl_career_site(career_url)
+    if sum(len(text) for _, text in pages) > 300:
+        from ranking import career_excerpt
+
+        return [career_excerpt(text) for text in _split_pages(pages, max(1, min(chunks, len(pages))))]
+    return [format_fallback(results_raw)]
+
+
+def gather_job_data(results_raw, career_url):
+    return gather_job_chunks(results_raw, career_url)[0]
+
+
+# Fields that tell two openings apart: the same title in another city or team is another job
+JOB_IDENTITY_FIELDS = ("role", "location", "department", "team", "id")
+
+
+def merge_jobs(job_lists):
+    # Chunks of one site overlap (the same role on a listing and its detail page); keep the first
+    seen = set()
+    merged = []
+    for jobs in job_lists:
+        for job in jobs:
+            if isinstance(job, dict):
+                key = tuple(str(job.get(field) or '').strip().casefold() for field in JOB_IDENTITY_FIELDS)
+            else:
+                key = str(job)
+            if key not in seen:
+                seen.add(key)
+                merged.append(job)
+    return merged
+
+
+def stored_jobs(display_name, parts, inst_context):
+    """(jobs, changes) from the last scan if extract_jobs would get exactly the same input, else None."""
+    stored = get_job_store().lookup(normalize_company(display_name), content_hash(parts, inst_context))
+    telemetry.inc("cache_events_total", cache="job_store", result="hit" if stored else "miss")
+    return stored
+
+
+def record_jobs(display_name, career_url, parts, inst_context, jobs):
+    """Save a fresh extraction and return how it differs from the previous scan."""
+    from chains import FALLBACK_JOB
+
+    # A failed or unparseable extraction must not be pinned until the page changes
+    if not jobs or FALLBACK_JOB in jobs:
+        return None
+    return get_job_store().save(normalize_company(display_name), display_name, career_url,
+                                content_hash(parts, inst_context), jobs)
+
+
+def scan_company_jobs(chain, display_name, results_raw, career_url, inst_context, chunks=EXTRACT_CHUNKS, on_job=None):
+    """(jobs, changes) for the company's career site; extract_jobs only runs if its input changed.
+
+    `on_job`, if given, is called with each job as soon as the model has produced it (stored
+    jobs all at once), from whichever thread is extracting; a role is only reported once.
+    """
+    parts = gather_job_chunks(results_raw, career_url, chunks)
+    stored = stored_jobs(display_name, parts, inst_context)
+    if stored:
+        for job in stored[0] if on_job else []:
+            on_job(job)
+        return stored
+
+    from chains import JobStreamInterrupted
+
+    reported, interrupted, lock = set(), [], threading.Lock()
+
+    def extract(part, institution_context):
+        if on_job is None:
+            return chain.extract_jobs(part, institution_context=institution_context)
+        jobs = []
+        try:
+            for job in chain.stream_jobs(part, institution_context=institution_context):
+                jobs.append(job)
+                key = str(job.get('role', '')).strip().casefold()
+                with lock:
+                    if key in reported:
+                        continue
+                    reported.add(key)
+                on_job(job)
+        except JobStreamInterrupted:
+            # The roles already shown stay, but they are not the page's full list
+            interrupted.append(part)
+        return jobs
+
+    if len(parts) == 1:
+        jobs = extract(parts[0], institution_context=inst_context)
+    else:
+        with ThreadPoolExecutor(max_workers=len(parts)) as pool:
+            futures = [pool.submit(telemetry.bind(extract), part, institution_context=inst_context) for part in parts]
+            jobs = merge_jobs(future.result() for future in futures)
+    if interrupted:
+        # Stored, it would be served as "unchanged" until the site changes
+        return jobs, None
+    return jobs, record_jobs(display_name, career_url, parts, inst_context, jobs)
+
+
+def company_intelligence(chain, display_name, results_raw, institution_name, institution_summary, fused=False):
+    """Report + jobs for one company.
+
+    fused=True asks for both in a single model call (the institution summary is sent once).
+    Otherwise, or if the combined answer can't be parsed, the report call runs in parallel
+    with the scrape -> extract_jobs branch. Jobs come from the job store when the career
+    content is unchanged since the last scan, and `changes` reports what moved since then.
+    """
+    career_url = pick_career_url(results_raw, display_name)
+    snippets = format_snippets(results_raw)
+    inst_context = build_institution_context(institution_name, institution_summary, display_name)
+
+    if fused:
+        parts = gather_job_chunks(results_raw, career_url)
+        data = parts[0]
+        stored = stored_jobs(display_name, parts, inst_context)
+        if stored:
+            # Same career content as last time: only the report needs the model
+            report = chain.generate_company_report(display_name, snippets, institution_summary)
+            return {"career_url": career_url, "report": report, "jobs": stored[0], "changes": stored[1]}
+        try:
+            result = chain.company_intelligence(display_name, snippets, data, institution_name, institution_summary)
+            changes = record_jobs(display_name, career_url, parts, inst_context, result["jobs"])
+            return {"career_url": career_url, **result, "changes": changes}
+        except Exception as e:
+            # Two more calls would only hit the same limit
+            if classify(e) == "rate_limit":
+                raise
+            print(f"Combined intelligence failed for {display_name}, using separate calls: {e}")
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            jobs_future = pool.submit(telemetry.bind(chain.extract_jobs), data, institution_context=inst_context)
+            report = chain.generate_company_report(display_name, snippets, institution_summary)
+            jobs = jobs_future.result()
+            changes = record_jobs(display_name, career_url, parts, inst_context, jobs)
+            return {"career_url": career_url, "report": report, "jobs": jobs, "changes": changes}
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        jobs_future = pool.submit(telemetry.bind(scan_company_jobs), chain, display_name, results_raw, career_url, inst_context)
+        report = chain.generate_company_report(display_name, snippets, institution_summary)
+        jobs, changes = jobs_future.result()
+        return {"career_url": career_url, "report": report, "jobs": jobs, "changes": changes}
+
+
+def parse_recipients(csv_text):
+    """Recipients from a CSV with a `name` column and optional designation/title and email columns."""
+    reader = csv.DictReader(io.StringIO(csv_text))
+    columns = {c.strip().lower(): c for c in reader.fieldnames or []}
+    name_col = next((columns[c] for c in ("name", "recipient", "full name", "contact") if c in columns), None)
+    if name_col is None:
+        raise ValueError("Recipient CSV needs a `name` column.")
+    designation_col = next((columns[c] for c in ("designation", "title", "role", "position") if c in columns), None)
+    email_col = columns.get("email")
+
+    seen = set()
+    recipients = []
+    for row in reader:
+        name = (row.get(name_col) or "").strip()
+        email = (row.get(email_col) or "").strip() if email_col else ""
+        if not name or (name.lower(), email.lower()) in seen:
+            continue
+        seen.add((name.lower(), email.lower()))
+        recipients.append({
+            "name": name,
+            "designation": (row.get(designation_col) or "").strip() if designation_col else "",
+            "email": email,
+        })
+    return recipients
+
+
+class DraftArchive:
+    """Zip of drafts that grows as each one finishes, with a recipients.csv index written on close."""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+        self.zip = zipfile.ZipFile(self.buffer, "w", zipfile.ZIP_DEFLATED)
+        self.rows = []
+
+    def add(self, index, recipient, draft):
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", recipient.get("name", "")).strip("_") or "recipient"
+        filename = f"{index + 1:03d}_{slug}.txt"
+        self.zip.writestr(filename, draft)
+        self.rows.append((index, recipient, filename))
+
+    def close(self):
+        index_csv = io.StringIO()
+        writer = csv.writer(index_csv)
+        writer.writerow(["name", "designation", "email", "file"])
+        for _, recipient, filename in sorted(self.rows, key=lambda row: row[0]):
+            writer.writerow([recipient.get("name"), recipient.get("designation"), recipient.get("email"), filename])
+        self.zip.writestr("recipients.csv", index_csv.getvalue())
+        self.zip.close()
+        return self.buffer.getvalue()
@@ -1,21 +1,97 @@
+import hashlib
+import io
+import os
+import threading
 import pandas as pd
 import chromadb
-import uuid
+from chromadb.utils import embedding_functions
+
+import resources
+import telemetry
+from vector_index import EmbeddingCache, VectorIndex
+
+# Bump when the id scheme changes so existing collections get re-synced
+SYNC_VERSION = "1"
 
 
 class Portfolio:
-    def __init__(self, file_path="resource/my_portfolio.csv"):
+    def __init__(self, file_path="resource/my_portfolio.csv", backend=None, embedding_function=None):
         self.file_path = file_path
-        self.data = pd.read_csv(file_path)
-        self.chroma_client = chromadb.PersistentClient('vectorstore')
-        self.collection = self.chroma_client.get_or_create_collection(name="portfolio")
+        # "numpy" keeps the whole portfolio in an in-process matrix and never starts Chroma
+        self.backend = backend or os.getenv("PORTFOLIO_BACKEND", "chroma")
+        embedding_function = embedding_function or embedding_functions.DefaultEmbeddingFunction()
+        self.embeddings = EmbeddingCache(embedding_function)
+        # One Portfolio is shared by every Streamlit session; concurrent reruns must not sync at once
+        self._sync_lock = threading.Lock()
+        if self.backend == "numpy":
+            self.chroma_client = self.collection = None
+            self.index = VectorIndex(self.embeddings, os.path.join(resources.data_path("vectorstore"), "portfolio_index"))
+            self.index.load()
+        else:
+            self.index = None
+            self.chroma_client = chromadb.PersistentClient(resources.data_path('vectorstore'))
+            self.collection = self.chroma_client.get_or_create_collection(name="portfolio", embedding_function=embedding_function)
+
+    @staticmethod
+    def row_id(techstack, links):
+        # Content-addressed id: an unchanged row keeps its id, an edited row gets a new one
+        return hashlib.sha1(f"{techstack}\x1f{links}".encode("utf-8")).hexdigest()
+
+    def _read_csv(self):
+        # Re-read on every sync, and fingerprint the same bytes the rows come from, so an edit
+        # made while the app runs is both detected and applied
+        with open(self.file_path, "rb") as f:
+            raw = f.read()
+        return f"{SYNC_VERSION}:{hashlib.sha256(raw).hexdigest()}", raw
 
     def load_portfolio(self):
-        if not self.collection.count():
-            for _, row in self.data.iterrows():
-                self.collection.add(documents=row["Techstack"],
-                                    metadatas={"links": row["Links"]},
-                                    ids=[str(uuid.uuid4())])
+        with telemetry.span("portfolio.sync", backend=self.backend) as span:
+            result = self.sync()
+            span.set(**result)
+            return result
+
+    def _rows(self, raw):
+        data = pd.read_csv(io.BytesIO(raw))
+        rows = {}
+        for techstack, links in zip(data["Techstack"].astype(str), data["Links"].astype(str)):
+            rows[self.row_id(techstack, links)] = (techstack, links)
+        return rows
+
+    def sync(self):
+        """Bring the index in line with the CSV: upsert new/changed rows, delete removed ones."""
+        with self._sync_lock:
+            return self._sync()
+
+    def _sync(self):
+        fingerprint, raw = self._read_csv()
+        if self.index is not None:
+            if self.index.fingerprint == fingerprint:
+                return {"added": 0, "removed": 0, "unchanged": True}
+            rows = self._rows(raw)
+            existing = set(self.index.ids)
+            self.index.build(rows, fingerprint)
+            return {"added": len(rows.keys() - existing), "removed": len(existing - rows.keys()), "unchanged": False}
+
+        metadata = {k: v for k, v in (self.collection.metadata or {}).items() if not k.startswith("hnsw:")}
+        if metadata.get("csv_fingerprint") == fingerprint:
+            return {"added": 0, "removed": 0, "unchanged": True}
+
+        rows = self._rows(raw)
+        existing = set(self.collection.get(include=[])["ids"])
+        added = [row_id for row_id in rows if row_id not in existing]
+        removed = [row_id for row_id in existing if row_id not in rows]
+
+        batch_size = self.chroma_client.get_max_batch_size()
+        for start in range(0, len(added), batch_size):
+            ids = added[start:start + batch_size]
+            self.collection.upsert(ids=ids,
+                                   documents=[rows[row_id][0] for row_id in ids],
+                                   metadatas=[{"links": rows[row_id][1]} for row_id in ids])
+        for start in range(0, len(removed), batch_size):
+            self.collection.delete(ids=removed[start:start + batch_size])
+
+        self.collection.modify(metadata={**metadata, "csv_fingerprint": fingerprint})
+        return {"added": len(added), "removed": len(removed), "unchanged": False}
 
     def query_links(self, skills):
         # Ensure skills is a list of strings
@@ -28,4 +104,29 @@ class Portfolio:
         else:
             # Convert all items in the list to strings
             skills = [str(skill) for skill in skills]
-        return self.collection.query(query_texts=skills, n_results=2).get('metadatas', [])
+        with telemetry.span("portfolio.query_links", backend=self.backend, skills=len(skills)) as span:
+            hits_before = self.embeddings.hits
+            if self.index is not None:
+                metadatas = self.index.query(skills, n_results=2)
+            else:
+                # Same embedding function as the collection, but repeated skills skip the model
+                metadatas = self.collection.query(query_embeddings=self.embeddings.embed(skills).tolist(),
+                                                  n_results=2).get('metadatas', [])
+            span.set(embedding_cache_hits=self.embeddings.hits - hits_before)
+            return self._dedupe_links(metadatas)
+
+    @staticmethod
+    def _dedupe_links(metadatas):
+        # Neighbouring skills tend to hit the same projects; each link is returned once
+        seen = set()
+        deduped = []
+        for per_skill in metadatas:
+            kept = []
+            for meta in per_skill or []:
+                link = (meta or {}).get("links")
+                if link in seen:
+                    continue
+                seen.add(link)
+                kept.append(meta)
+            deduped.append(kept)
+        return deduped
@@ -0,0 +1,86 @@
+"""Institution summaries kept across sessions, keyed by the normalised institution URL.
+
+Each profile remembers a hash of the excerpt it was summarised from, so a refresh that finds
+the site unchanged only bumps `checked_at` instead of calling the model again.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+import resources
+from search import normalize_url
+
+
+def institution_key(url):
+    # http/https, www., a trailing slash and tracking parameters all name the same institution
+    url = url.strip()
+    if "://" not in url:
+        url = "https://" + url
+    return normalize_url(url).split("://", 1)[1]
+
+
+class ProfileStore:
+    def __init__(self, path=None, max_age=None):
+        self.path = path or os.getenv("PROFILE_STORE_PATH", resources.data_path("profile_store.sqlite3"))
+        # Institutions change about once a semester; a week-old summary is refreshed in the background
+        self.max_age = max_age if max_age is not None else int(os.getenv("PROFILE_MAX_AGE", str(7 * 24 * 3600)))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS profiles ("
+            "key TEXT PRIMARY KEY, url TEXT NOT NULL, institution_name TEXT, content_hash TEXT NOT NULL, "
+            "summary TEXT NOT NULL, updated_at REAL NOT NULL, checked_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _row(row):
+        return {"key": row[0], "url": row[1], "institution_name": row[2], "content_hash": row[3],
+                "summary": row[4], "updated_at": row[5], "checked_at": row[6]}
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, url, institution_name, content_hash, summary, updated_at, checked_at "
+                "FROM profiles WHERE key = ?", (key,)
+            ).fetchone()
+        return self._row(row) if row else None
+
+    def list(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, url, institution_name, content_hash, summary, updated_at, checked_at "
+                "FROM profiles ORDER BY checked_at DESC"
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def is_stale(self, profile):
+        return time.time() - profile["checked_at"] > self.max_age
+
+    def save(self, key, url, institution_name, content_hash, summary):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO profiles (key, url, institution_name, content_hash, summary, updated_at, checked_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, url, institution_name, content_hash, summary, now, now),
+            )
+            self._conn.commit()
+
+    def touch(self, key):
+        with self._lock:
+            self._conn.execute("UPDATE profiles SET checked_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_profile_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ProfileStore()
+        return _store
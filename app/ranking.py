@@ -0,0 +1,91 @@
+"""Pick the most relevant parts of a scraped page instead of truncating it.
+
+The cleaned text is cut into fixed-size word windows, each window is scored with BM25
+against query terms for the prompt it will feed, and the best windows are kept (in page
+order) until the token budget is used up.
+"""
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+INSTITUTION_QUERY = [
+    "department", "departments", "engineering", "computer", "science", "technology", "electronics",
+    "placement", "placements", "placed", "recruiters", "companies", "package", "students", "graduates",
+    "research", "labs", "programs", "btech", "mtech", "mba", "faculty", "accredited", "naac", "nba",
+    "nirf", "ranking", "industry", "internship", "training", "skills", "courses",
+]
+
+CAREER_QUERY = [
+    "job", "jobs", "role", "roles", "position", "positions", "opening", "openings", "vacancy", "hiring",
+    "engineer", "developer", "analyst", "manager", "intern", "internship", "graduate", "trainee",
+    "skills", "experience", "years", "requirements", "responsibilities", "qualification", "qualifications",
+    "apply", "location", "remote", "fulltime", "python", "java", "cloud", "data", "software",
+]
+
+# Roughly what the old cleaned[:10000] slice cost for institutions; careers get more room for listings
+INSTITUTION_TOKEN_BUDGET = int(os.getenv("INSTITUTION_TOKEN_BUDGET", "2500"))
+CAREER_TOKEN_BUDGET = int(os.getenv("CAREER_TOKEN_BUDGET", "6000"))
+CHUNK_WORDS = 120
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def estimate_tokens(text):
+    # ~4 characters per token is close enough for English prompts to Llama tokenizers
+    return len(text) // 4 + 1
+
+
+def chunk_words(text, size=CHUNK_WORDS):
+    words = text.split()
+    return [" ".join(words[i:i + size]) for i in range(0, len(words), size)]
+
+
+def bm25_scores(chunks, query_terms, k1=1.5, b=0.75):
+    terms = sorted({term.lower() for term in query_terms})
+    index = {term: j for j, term in enumerate(terms)}
+    tf = np.zeros((len(chunks), len(terms)), dtype=np.float32)
+    lengths = np.empty(len(chunks), dtype=np.float32)
+    for i, chunk in enumerate(chunks):
+        tokens = _WORD_RE.findall(chunk.lower())
+        lengths[i] = len(tokens)
+        for token, count in Counter(tokens).items():
+            j = index.get(token)
+            if j is not None:
+                tf[i, j] = count
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((len(chunks) - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / max(lengths.mean(), 1.0))
+    return ((tf * (k1 + 1)) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+
+def select_relevant(text, query_terms, token_budget, chunk_size=CHUNK_WORDS):
+    """Best-scoring chunks of text that fit in token_budget, joined back in page order."""
+    if not text or estimate_tokens(text) <= token_budget:
+        return text
+    chunks = chunk_words(text, chunk_size)
+    scores = bm25_scores(chunks, query_terms)
+    # Stable sort keeps page order among equal scores, so a page with no matching terms
+    # degrades to the old "take the beginning" behaviour
+    order = np.argsort(-scores, kind="stable")
+    picked, used = [], 0
+    for i in order:
+        cost = estimate_tokens(chunks[i])
+        if used + cost > token_budget:
+            continue
+        picked.append(i)
+        used += cost
+    if not picked:
+        # Budget smaller than a single chunk: trim the best one
+        return chunks[order[0]][:token_budget * 4]
+    return " ".join(chunks[i] for i in sorted(picked))
+
+
+def institution_excerpt(text, token_budget=INSTITUTION_TOKEN_BUDGET):
+    return select_relevant(text, INSTITUTION_QUERY, token_budget)
+
+
+def career_excerpt(text, token_budget=CAREER_TOKEN_BUDGET):
+    return select_relevant(text, CAREER_QUERY, token_budget)
@@ -0,0 +1,90 @@
+"""Start-up bookkeeping: background warm-up of heavy imports and a timing report.
+
+Streamlit re-executes main.py on every interaction, but imported modules persist, so the
+state kept here survives reruns for the life of the server process.
+"""
+import importlib
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+PROCESS_STARTED = time.perf_counter()
+
+# Imported on the request path otherwise; ordered roughly by first use
+HEAVY_MODULES = [
+    "langchain_core.prompts",
+    "langchain_groq",
+    "ddgs",
+    "requests",
+    "numpy",
+    "pandas",
+    "chromadb",
+]
+
+_timings = {}
+_lock = threading.Lock()
+_warmup_thread = None
+_warmup_done = threading.Event()
+
+
+def _record(name, value):
+    with _lock:
+        _timings.setdefault(name, round(value, 4) if isinstance(value, float) else value)
+
+
+@contextmanager
+def timed(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - started)
+
+
+def data_path(name):
+    """Default location of an on-disk cache or store: the working directory, or the temp dir on Vercel.
+
+    Vercel functions can only write under /tmp, which is per instance and wiped when it is recycled.
+    """
+    return os.path.join(tempfile.gettempdir(), name) if os.getenv("VERCEL") else name
+
+
+def lazy_import(name):
+    """importlib.import_module that records how long the first import took."""
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    _record(f"import {name}", time.perf_counter() - started)
+    return module
+
+
+def _warm(modules):
+    for name in modules:
+        try:
+            lazy_import(name)
+        except Exception as e:
+            # A missing optional dependency shouldn't kill the warm-up of the others
+            _record(f"import {name}", f"unavailable ({type(e).__name__})")
+    _record("warmup total", time.perf_counter() - PROCESS_STARTED)
+    _warmup_done.set()
+
+
+def start_warmup(modules=HEAVY_MODULES):
+    """Import heavy dependencies on a daemon thread, once per process."""
+    global _warmup_thread
+    with _lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=_warm, args=(list(modules),), name="warmup", daemon=True)
+            _warmup_thread.start()
+    return _warmup_thread
+
+
+def startup_report():
+    with _lock:
+        timings = dict(_timings)
+    return {
+        "uptime_s": round(time.perf_counter() - PROCESS_STARTED, 3),
+        "warmup_done": _warmup_done.is_set(),
+        "timings_s": timings,
+    }
@@ -0,0 +1,245 @@
+"""Shared admission control for Groq calls.
+
+Every request waits for a slot in two token buckets (requests per minute and estimated
+tokens per minute) before it is sent. Waiters are served by lane, so an interactive draft
+jumps ahead of queued batch extraction. 429s pause the whole scheduler for the server's
+retry-after, other transient failures back off with jitter, and both are retried.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import telemetry
+
+# Lower number is served first
+LANES = {"interactive": 0, "background": 1, "batch": 2}
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+class TokenBucket:
+    """Refills continuously at `per_minute / 60` per second up to `per_minute`; the level may go negative."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount, now):
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+
+def estimate_tokens(text, completion=0):
+    # ~4 characters per token for English prose, plus what the answer is expected to cost
+    return len(text) // 4 + completion
+
+
+def _parse_duration(value):
+    # Groq's reset headers look like "7.66s", "2m59.56s" or "250ms"
+    parts = _DURATION_RE.findall(value or "")
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts) if parts else None
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait, from retry-after or the x-ratelimit-reset-* headers."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    resets = [_parse_duration(headers.get(h)) for h in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")]
+    resets = [r for r in resets if r is not None]
+    return max(resets) if resets else None
+
+
+def classify(error):
+    # "rate_limit", "transient", or None when retrying wouldn't help
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status == 429 or type(error).__name__ == "RateLimitError":
+        return "rate_limit"
+    if status in (500, 502, 503, 504) or type(error).__name__ in ("APIConnectionError", "APITimeoutError"):
+        return "transient"
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return "transient"
+    return None
+
+
+class RateLimitScheduler:
+    def __init__(self, rpm=None, tpm=None, max_retries=4, base_delay=1.0, max_delay=60.0):
+        self.requests = TokenBucket(rpm or int(os.getenv("GROQ_RPM", "30")))
+        self.tokens = TokenBucket(tpm or int(os.getenv("GROQ_TPM", "12000")))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (lane rank, seq)
+        self._seq = itertools.count()
+        self._depth = {lane: 0 for lane in LANES}
+        self._paused_until = 0.0
+
+    def _set_depth(self, lane, delta):
+        self._depth[lane] += delta
+        telemetry.set_gauge("llm_queue_depth", self._depth[lane], lane=lane)
+
+    def acquire(self, tokens, lane="background"):
+        """Block until this request fits both budgets and nobody ahead of it is waiting."""
+        with telemetry.span("llm.queue", lane=lane, tokens=tokens):
+            ticket = (LANES[lane], next(self._seq))
+            with self._cond:
+                heapq.heappush(self._waiting, ticket)
+                self._set_depth(lane, 1)
+                try:
+                    while True:
+                        wait = None
+                        if self._waiting[0] == ticket:
+                            now = time.monotonic()
+                            wait = max(self._paused_until - now,
+                                       self.requests.wait_time(1, now),
+                                       self.tokens.wait_time(tokens, now))
+                            if wait <= 0:
+                                self.requests.take(1, now)
+                                self.tokens.take(tokens, now)
+                                return
+                        self._cond.wait(wait)
+                finally:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._set_depth(lane, -1)
+                    self._cond.notify_all()
+
+    async def aacquire(self, tokens, lane="background"):
+        await asyncio.to_thread(telemetry.bind(self.acquire), tokens, lane)
+
+    def settle(self, estimated, actual):
+        """Correct the token budget once the real usage of a request is known."""
+        if actual is None:
+            return
+        with self._cond:
+            now = time.monotonic()
+            if actual > estimated:
+                self.tokens.take(actual - estimated, now)
+            else:
+                self.tokens.give_back(estimated - actual, now)
+            self._cond.notify_all()
+
+    def _backoff(self, error, attempt):
+        """Seconds to wait before retrying `error`, or None if it should propagate."""
+        kind = classify(error)
+        if kind is None or attempt >= self.max_retries:
+            return None
+        telemetry.inc("llm_retries_total", reason=kind)
+        server_wait = retry_after(error) if kind == "rate_limit" else None
+        if server_wait is not None:
+            delay = min(self.max_delay, server_wait) + random.uniform(0, self.base_delay)
+        else:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt + 1)))
+        if kind == "rate_limit":
+            # The limit is shared by every caller, so everyone holds off, not just this request
+            with self._cond:
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            return 0.0
+        return delay
+
+    def run(self, fn, tokens, lane="background"):
+        for attempt in itertools.count():
+            self.acquire(tokens, lane)
+            try:
+                return fn()
+            except Exception as e:
+                delay = self._backoff(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def arun(self, fn, tokens, lane="background"):
+        for attempt in itertools.count():
+            await self.aacquire(tokens, lane)
+            try:
+                return await fn()
+            except Exception as e:
+                delay = self._backoff(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    def stream(self, open_stream, tokens, lane="background"):
+        # A stream is only retried if it failed before producing anything
+        for attempt in itertools.count():
+            self.acquire(tokens, lane)
+            started = False
+            try:
+                for chunk in open_stream():
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                delay = None if started else self._backoff(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def astream(self, open_stream, tokens, lane="background"):
+        for attempt in itertools.count():
+            await self.aacquire(tokens, lane)
+            started = False
+            try:
+                async for chunk in open_stream():
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                delay = None if started else self._backoff(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            self.requests.wait_time(0, now)
+            self.tokens.wait_time(0, now)
+            return {
+                "queued": dict(self._depth),
+                "requests_available": round(self.requests.level, 1),
+                "tokens_available": round(self.tokens.level),
+                "paused_for_s": round(max(0.0, self._paused_until - now), 2),
+            }
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(api_key=None):
+    # Groq limits are per key, so callers sharing a key share one scheduler
+    with _schedulers_lock:
+        if api_key not in _schedulers:
+            _schedulers[api_key] = RateLimitScheduler()
+        return _schedulers[api_key]
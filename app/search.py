@@ -0,0 +1,197 @@
+"""Web search stage: query variants in parallel, merged by URL and cached on disk.
+
+Each variant is cached separately under its normalised query for SEARCH_CACHE_TTL seconds
+(default 6 hours), so a repeated lookup never leaves the machine. Empty answers and failed
+queries are remembered for SEARCH_EMPTY_TTL seconds (default 5 minutes) only.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import resources
+import telemetry
+
+# (query template, max_results); the first variant's order leads the merged list
+QUERY_VARIANTS = [
+    ("{name} careers jobs openings", 8),
+    ("{name} careers", 5),
+    ("{name} campus hiring", 5),
+]
+
+_CAREER_PATH_RE = re.compile(r"(^|[/_.-])(careers?|jobs?|openings|vacanc(y|ies)|join-?us|work-?with-?us|hiring|recruit\w*)([/_.-]|$)")
+_TRACKING_PARAMS = {"gclid", "fbclid", "ref", "src"}
+# Applicant tracking systems that host a company's real job list
+ATS_HOSTS = ("greenhouse.io", "lever.co", "myworkdayjobs.com", "smartrecruiters.com", "workable.com",
+             "icims.com", "taleo.net", "successfactors.com", "ashbyhq.com", "darwinbox.in")
+# Aggregators rarely let us scrape and are about many companies at once
+AGGREGATOR_HOSTS = ("linkedin.com", "indeed.", "glassdoor.", "naukri.com", "monster.", "ambitionbox.com",
+                    "wikipedia.org", "shine.com", "foundit.in", "instahyre.com")
+
+
+def normalize_query(query):
+    return " ".join(query.casefold().split())
+
+
+def normalize_url(url):
+    # Dedupe key only: the original href is what callers get back
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query)
+                       if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS])
+    return urlunsplit((parts.scheme.lower() or "https", host, parts.path.rstrip("/"), query, ""))
+
+
+class SearchCache:
+    def __init__(self, path=None, ttl=None, max_entries=None, empty_ttl=None):
+        self.path = path or os.getenv("SEARCH_CACHE_PATH", resources.data_path("search_cache.sqlite3"))
+        self.ttl = ttl if ttl is not None else int(os.getenv("SEARCH_CACHE_TTL", str(6 * 3600)))
+        self.empty_ttl = empty_ttl if empty_ttl is not None else int(os.getenv("SEARCH_EMPTY_TTL", "300"))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "5000"))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS searches (query TEXT PRIMARY KEY, results TEXT NOT NULL, fetched_at REAL NOT NULL, ttl REAL)"
+        )
+        # Caches created before per-entry lifetimes have no ttl column; their rows use self.ttl
+        if "ttl" not in {row[1] for row in self._conn.execute("PRAGMA table_info(searches)")}:
+            self._conn.execute("ALTER TABLE searches ADD COLUMN ttl REAL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS searches_fetched ON searches (fetched_at)")
+        self._conn.commit()
+
+    def get(self, query):
+        with self._lock:
+            row = self._conn.execute("SELECT results, fetched_at, ttl FROM searches WHERE query = ?", (query,)).fetchone()
+        if row is None or time.time() - row[1] > (row[2] if row[2] is not None else self.ttl):
+            return None
+        return json.loads(row[0])
+
+    def set(self, query, results, ttl=None):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO searches (query, results, fetched_at, ttl) VALUES (?, ?, ?, ?)",
+                               (query, json.dumps(results), time.time(), ttl))
+            # Expired rows are dropped on every write, then the oldest ones past the size bound
+            self._conn.execute("DELETE FROM searches WHERE fetched_at + COALESCE(ttl, ?) < ?", (self.ttl, time.time()))
+            overflow = self._conn.execute("SELECT COUNT(*) FROM searches").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM searches WHERE query IN (SELECT query FROM searches ORDER BY fetched_at LIMIT ?)",
+                    (overflow,),
+                )
+            self._conn.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SearchCache()
+        return _cache
+
+
+def _run_query(query, max_results):
+    from ddgs import DDGS
+
+    # One client per thread: DDGS keeps per-instance session state
+    with DDGS() as ddgs:
+        return list(ddgs.text(query, max_results=max_results))
+
+
+def _cached_query(cache, query, max_results):
+    key = normalize_query(query)
+    cached = cache.get(key)
+    if cached is not None:
+        telemetry.inc("cache_events_total", cache="search", result="hit")
+        return cached, True
+    telemetry.inc("cache_events_total", cache="search", result="miss")
+    # Empty answers and failures are usually DDGS throttling us: not worth keeping for hours, but
+    # remembered briefly so retries within a few minutes back off instead of adding to it
+    try:
+        results = _run_query(query, max_results)
+    except Exception:
+        cache.set(key, [], ttl=cache.empty_ttl)
+        raise
+    cache.set(key, results, ttl=None if results else cache.empty_ttl)
+    return results, False
+
+
+def merge_results(result_lists):
+    seen = set()
+    merged = []
+    for results in result_lists:
+        for res in results:
+            key = normalize_url(res.get('href', ''))
+            if res.get('href') and key not in seen:
+                seen.add(key)
+                merged.append(res)
+    return merged
+
+
+def search_company(display_name, variants=QUERY_VARIANTS):
+    cache = get_search_cache()
+    queries = [(template.format(name=display_name), max_results) for template, max_results in variants]
+    with telemetry.span("search", company=display_name) as span:
+        with ThreadPoolExecutor(max_workers=len(queries)) as pool:
+            futures = [pool.submit(telemetry.bind(_cached_query), cache, query, max_results) for query, max_results in queries]
+        result_lists, errors, hits = [], [], 0
+        for future in futures:
+            try:
+                results, cached = future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+            result_lists.append(results)
+            hits += cached
+        if errors and not result_lists:
+            raise errors[0]
+        merged = merge_results(result_lists)
+        span.set(results=len(merged), cached_queries=hits, failed_queries=len(errors))
+    return merged
+
+
+def career_score(res, company=None):
+    """0 for results with no sign of being a job page, otherwise higher is a better career URL."""
+    parts = urlsplit(res.get('href', ''))
+    host = parts.netloc.lower().removeprefix("www.")
+    path = parts.path.lower()
+    signal = 0
+    if host.startswith(("careers.", "jobs.", "career.")):
+        signal += 4
+    if _CAREER_PATH_RE.search(path):
+        signal += 3
+    if any(host == ats or host.endswith("." + ats) for ats in ATS_HOSTS):
+        signal += 3
+    if re.search(r"\b(careers?|jobs?|openings)\b", res.get('title', '').lower()):
+        signal += 1
+    if not signal:
+        return 0
+
+    score = signal
+    if any(agg in host for agg in AGGREGATOR_HOSTS):
+        score -= 3
+    if company:
+        slug = re.sub(r"[^a-z0-9]", "", company.lower())
+        if slug and slug in host.replace(".", "").replace("-", ""):
+            score += 2
+    # The listing itself tends to sit near the root; deep paths are single postings or articles
+    if path.count("/") <= 2:
+        score += 1
+    return max(score, 1)
+
+
+def pick_career_url(results_raw, company=None):
+    # Highest scoring result, ties in search order; with no career signal at all the top hit wins
+    best_index, best_score = 0, 0
+    for index, res in enumerate(results_raw):
+        score = career_score(res, company)
+        if score > best_score:
+            best_index, best_score = index, score
+    return results_raw[best_index]['href']
@@ -0,0 +1,82 @@
+"""Process-wide deduplication of identical work.
+
+    flight = SingleFlight(ttl=60)
+    result, shared = flight.do(key, expensive, arg)
+
+The first caller for a key runs `expensive` itself, on the caller's thread; callers arriving
+while it runs wait for that result instead of starting their own, and for `ttl` seconds
+afterwards the result is served from a small memo. Results are deep-copied per caller so
+nobody can mutate another session's copy.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import telemetry
+
+
+class _Abandoned(Exception):
+    # The leader was interrupted (e.g. Streamlit stopped its script); a waiter takes over
+    pass
+
+
+class SingleFlight:
+    def __init__(self, name, ttl=60, max_entries=256):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._memo = OrderedDict()  # key -> (expires_at, value)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Return (result, shared); shared is True when the result came from another caller or the memo."""
+        while True:
+            with self._lock:
+                memo = self._memo.get(key)
+                if memo and memo[0] > time.monotonic():
+                    self._memo.move_to_end(key)
+                    telemetry.inc("singleflight_total", flight=self.name, result="memo")
+                    return copy.deepcopy(memo[1]), True
+                future = self._inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = self._inflight[key] = Future()
+
+            if leader:
+                telemetry.inc("singleflight_total", flight=self.name, result="leader")
+                return self._lead(key, future, fn, args, kwargs), False
+
+            telemetry.inc("singleflight_total", flight=self.name, result="joined")
+            with telemetry.span("singleflight.wait", flight=self.name):
+                try:
+                    return copy.deepcopy(future.result()), True
+                except _Abandoned:
+                    continue
+
+    def _lead(self, key, future, fn, args, kwargs):
+        try:
+            value = fn(*args, **kwargs)
+        except Exception as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+        except BaseException:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(_Abandoned())
+            raise
+
+        with self._lock:
+            # None means "nothing found", which is worth retrying rather than remembering
+            if self.ttl and value is not None:
+                self._memo[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+                self._memo.move_to_end(key)
+                while len(self._memo) > self.max_entries:
+                    self._memo.popitem(last=False)
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
@@ -0,0 +1,218 @@
+"""Lightweight tracing and metrics for the outreach pipeline.
+
+    with telemetry.trace("company_search", company="Infosys"):
+        with telemetry.span("search") as s:
+            ...
+            s.set(results=8)
+
+Spans opened inside a trace become its timing waterfall; every span also feeds process-wide
+duration histograms. Completed traces are appended as JSONL when TRACE_LOG_PATH is set, and
+prometheus_text() renders all metrics in the Prometheus text exposition format.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+_current_trace = contextvars.ContextVar("outreach_trace", default=None)
+_lock = threading.Lock()
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_histograms = {}  # span name -> {"buckets": [...], "sum": float, "count": int}
+_counters = {}  # (metric, sorted label items) -> value
+_gauges = {}  # same keys as _counters, last value wins
+_recent_traces = deque(maxlen=50)
+
+
+class Span:
+    def __init__(self, name, trace, attrs):
+        self.name = name
+        self.trace = trace
+        self.attrs = dict(attrs)
+        self.thread = threading.current_thread().name
+        self.started = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "start_ms": round((self.started - self.trace.started) * 1000, 2) if self.trace else None,
+            "duration_ms": round(self.duration * 1000, 2) if self.duration is not None else None,
+            "thread": self.thread,
+            "attrs": self.attrs,
+        }
+
+
+class Trace:
+    def __init__(self, name, attrs):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = dict(attrs)
+        self.timestamp = time.time()
+        self.started = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self):
+        with self._lock:
+            spans = sorted((span.to_dict() for span in self.spans), key=lambda s: s["start_ms"])
+        return {
+            "trace_id": self.id,
+            "name": self.name,
+            "timestamp": self.timestamp,
+            "duration_ms": round(self.duration * 1000, 2) if self.duration is not None else None,
+            "attrs": self.attrs,
+            "spans": spans,
+        }
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(metric, value=1, **labels):
+    """Add to a counter, e.g. inc("cache_events_total", cache="llm", result="hit")."""
+    key = (metric, _label_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(metric, value, **labels):
+    """Record the current value of something that goes up and down, e.g. a queue depth."""
+    key = (metric, _label_key(labels))
+    with _lock:
+        _gauges[key] = value
+
+
+def _observe(name, seconds):
+    with _lock:
+        hist = _histograms.setdefault(name, {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0})
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if seconds <= bound:
+                hist["buckets"][i] += 1
+        hist["sum"] += seconds
+        hist["count"] += 1
+
+
+@contextmanager
+def span(name, **attrs):
+    current = _current_trace.get()
+    s = Span(name, current, attrs)
+    try:
+        yield s
+    except Exception as e:
+        s.set(error=type(e).__name__)
+        raise
+    finally:
+        s.duration = time.perf_counter() - s.started
+        _observe(name, s.duration)
+        if current is not None:
+            current.add(s)
+
+
+@contextmanager
+def trace(name, **attrs):
+    t = Trace(name, attrs)
+    token = _current_trace.set(t)
+    try:
+        yield t
+    finally:
+        _current_trace.reset(token)
+        t.duration = time.perf_counter() - t.started
+        _observe(f"trace.{name}", t.duration)
+        record = t.to_dict()
+        with _lock:
+            _recent_traces.append(record)
+        log_path = os.getenv("TRACE_LOG_PATH")
+        if log_path:
+            export_jsonl(log_path, [record])
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def bind(fn):
+    """Wrap fn so it runs inside the caller's trace when executed on a worker thread."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def record_llm_usage(method, message):
+    """Token counts from a LangChain AIMessage (usage_metadata, or Groq's token_usage)."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    prompt_tokens = usage.get("input_tokens", token_usage.get("prompt_tokens"))
+    completion_tokens = usage.get("output_tokens", token_usage.get("completion_tokens"))
+    if prompt_tokens is not None:
+        inc("llm_tokens_total", prompt_tokens, method=method, kind="prompt")
+    if completion_tokens is not None:
+        inc("llm_tokens_total", completion_tokens, method=method, kind="completion")
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+
+
+def recent_traces():
+    with _lock:
+        return list(_recent_traces)
+
+
+def last_trace():
+    with _lock:
+        return _recent_traces[-1] if _recent_traces else None
+
+
+def export_jsonl(path, traces=None):
+    traces = recent_traces() if traces is None else traces
+    with _lock:
+        with open(path, "a", encoding="utf-8") as f:
+            for record in traces:
+                f.write(json.dumps(record, default=str) + "\n")
+
+
+def _metric_name(name):
+    return "outreach_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def _render_samples(lines, kind, samples):
+    for metric in sorted({metric for metric, _ in samples}):
+        name = _metric_name(metric)
+        lines.append(f"# TYPE {name} {kind}")
+        for (m, labels), value in sorted(samples.items()):
+            if m == metric:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+
+def prometheus_text():
+    lines = []
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        histograms = {name: dict(h, buckets=list(h["buckets"])) for name, h in _histograms.items()}
+
+    _render_samples(lines, "counter", counters)
+    _render_samples(lines, "gauge", gauges)
+
+    if histograms:
+        name = _metric_name("span_duration_seconds")
+        lines.append(f"# TYPE {name} histogram")
+        for span_name, hist in sorted(histograms.items()):
+            for bound, count in zip(DURATION_BUCKETS, hist["buckets"]):
+                lines.append(f'{name}_bucket{{span="{span_name}",le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{span="{span_name}",le="+Inf"}} {hist["count"]}')
+            lines.append(f'{name}_sum{{span="{span_name}"}} {hist["sum"]:.6f}')
+            lines.append(f'{name}_count{{span="{span_name}"}} {hist["count"]}')
+    return "\n".join(lines) + "\n"
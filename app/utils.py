@@ -1,16 +1,37 @@
 import re
 
+_TAG_RE = re.compile(r'<[^>]*?>')
+# URLs (same character set as the old pattern, with its classes merged) and every
+# non-alphanumeric run, removed in one scan. A URL always starts with 'h', so no symbol
+# run can swallow the start of one and the result equals removing them one after the other.
+_URL_OR_SYMBOL_RE = re.compile(r'https?://[!$-_a-z]+|[^a-zA-Z0-9 ]+')
+
+
 def clean_text(text):
-    # Remove HTML tags
-    text = re.sub(r'<[^>]*?>', '', text)
-    # Remove URLs
-    text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', text)
-    # Remove special characters
-    text = re.sub(r'[^a-zA-Z0-9 ]', '', text)
-    # Replace multiple spaces with a single space
-    text = re.sub(r'\s{2,}', ' ', text)
-    # Trim leading and trailing whitespace
-    text = text.strip()
-    # Remove extra whitespace
-    text = ' '.join(text.split())
-    return text
\ No newline at end of file
+    # Remove HTML tags (first, since removing one can join a URL back together)
+    if '<' in text:
+        text = _TAG_RE.sub('', text)
+    # Remove URLs and special characters, then collapse the remaining spaces
+    return ' '.join(_URL_OR_SYMBOL_RE.sub('', text).split())
+
+
+# Scraping Helper
+def scrape_page_content(url):
+    try:
+        from extract import html_to_text
+        from fetch import get_fetcher
+
+        import telemetry
+
+        # Pooled session + conditional GET; an unchanged page comes back from the cache already cleaned
+        with telemetry.span("scrape", url=url) as span:
+            cleaned = get_fetcher().fetch_text(url, html_to_text)
+            span.set(chars=len(cleaned))
+        
+        if len(cleaned) < 500:
+            return None
+            
+        return cleaned
+    except Exception as e:
+        print(f"Scraping Error for {url}: {e}")
+        return None
@@ -0,0 +1,135 @@
+"""In-process portfolio index: a float32 embedding matrix memory-mapped from disk.
+
+Small portfolios fit comfortably in RAM, so a single matrix product against all query
+skills at once replaces Chroma's client start-up and per-query round trips. Each build
+writes a new matrix file and then switches meta.json to it, so a matrix that is still
+mapped is never overwritten (Windows refuses to replace a mapped file).
+"""
+import glob
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class EmbeddingCache:
+    """LRU of normalized embeddings per skill string; misses are embedded in one batch."""
+
+    def __init__(self, embed_fn, max_size=2048):
+        self.embed_fn = embed_fn
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed(self, texts):
+        with self._lock:
+            missing = [text for text in dict.fromkeys(texts) if text not in self._entries]
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        if missing:
+            vectors = _normalize(self.embed_fn(missing))
+            with self._lock:
+                for text, vector in zip(missing, vectors):
+                    self._entries[text] = vector
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        with self._lock:
+            rows = []
+            for text in texts:
+                # A concurrent embed can evict an entry between the two locked sections
+                vector = self._entries.get(text)
+                if vector is None:
+                    vector = _normalize(self.embed_fn([text]))[0]
+                    self._entries[text] = vector
+                self._entries.move_to_end(text)
+                rows.append(vector)
+        return np.stack(rows)
+
+
+class VectorIndex:
+    def __init__(self, embeddings, directory="vectorstore/portfolio_index"):
+        self.embeddings = embeddings
+        self.directory = directory
+        self.matrix = None
+        self.ids = []
+        self.links = []
+        self.fingerprint = None
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._build_lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self._meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            # Indexes written before versioned matrix files have no "matrix" entry
+            matrix = np.load(os.path.join(self.directory, meta.get("matrix", "embeddings.npy")), mmap_mode="r")
+        except (OSError, ValueError):
+            return False
+        self.fingerprint, self.ids, self.links = meta["fingerprint"], meta["ids"], meta["links"]
+        self.matrix = matrix
+        return True
+
+    def build(self, rows, fingerprint):
+        """rows: {row_id: (techstack, links)}. Embeddings of rows already indexed are reused."""
+        with self._build_lock:
+            return self._build(rows, fingerprint)
+
+    def _build(self, rows, fingerprint):
+        previous = dict(zip(self.ids, range(len(self.ids)))) if self.matrix is not None else {}
+        ids = list(rows)
+        new_ids = [row_id for row_id in ids if row_id not in previous]
+        fresh = dict(zip(new_ids, _normalize(self.embeddings.embed_fn([rows[i][0] for i in new_ids])))) if new_ids else {}
+        matrix = np.empty((len(ids), self._dimension(fresh)), dtype=np.float32)
+        for n, row_id in enumerate(ids):
+            matrix[n] = fresh[row_id] if row_id in fresh else self.matrix[previous[row_id]]
+
+        os.makedirs(self.directory, exist_ok=True)
+        # Unique names, so another process building at the same time never shares a file with this one
+        version = uuid.uuid4().hex
+        matrix_name = f"embeddings-{version}.npy"
+        np.save(os.path.join(self.directory, matrix_name), matrix)
+        tmp_meta = f"{self._meta_path}.{version}.tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "ids": ids, "links": [rows[i][1] for i in ids],
+                       "matrix": matrix_name}, f)
+        os.replace(tmp_meta, self._meta_path)
+        loaded = self.load()
+        for stale in glob.glob(os.path.join(self.directory, "embeddings*.npy")):
+            if os.path.basename(stale) != matrix_name:
+                try:
+                    os.remove(stale)
+                except OSError:
+                    # Still mapped somewhere on Windows; a later build removes it
+                    pass
+        return loaded
+
+    def _dimension(self, fresh):
+        if fresh:
+            return len(next(iter(fresh.values())))
+        if self.matrix is not None and self.matrix.ndim == 2:
+            return self.matrix.shape[1]
+        return 0
+
+    def query(self, skills, n_results=2):
+        """Top-n links per skill, in the shape Chroma returns metadatas: one list per skill."""
+        if self.matrix is None or not len(self.ids):
+            return [[] for _ in skills]
+        scores = self.embeddings.embed(skills) @ np.asarray(self.matrix).T
+        k = min(n_results, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in zip(scores, top):
+            ranked = candidates[np.argsort(-row[candidates])]
+            results.append([{"links": self.links[i]} for i in ranked])
+        return results